@@ -0,0 +1,133 @@
+# Batteries
+import os
+import queue
+import threading
+
+# Third-party Imports
+from loguru import logger
+
+# Local Imports
+from . import media
+from .metrics import Metrics
+
+
+class AccessLog(object):
+    """
+    Writes access log entries as JSON lines from a background thread.
+
+    Entries are queued as raw values and only formatted by the writer, which
+    drains the queue in batches so each batch costs one write. The queue is
+    bounded: entries logged while it is full are dropped and counted, as are
+    batches which could not be written.
+    """
+    # Access log entry fields
+    FIELDS = ('time', 'remote', 'forwarded', 'method', 'uri', 'route', 'status', 'duration', 'agent')
+
+    def __init__(self, path: str, queue_size: int = 10000, batch_size: int = 1000):
+        """
+        Create an access log writer, started by start().
+
+        Args:
+            path (str): The access log file, appended to.
+            queue_size (int, optional): The maximum number of pending entries. Defaults to 10000.
+            batch_size (int, optional): The maximum number of entries written at once. Defaults to 1000.
+        """
+        self._path = path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+        self._thread = threading.Thread(target=self._write, name='access-log', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Writes the pending entries and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+        if self.dropped:
+            logger.warning(f'Dropped {self.dropped} access log entries while the queue was full or the log unwritable.')
+
+    def log(self, *values):
+        """
+        Queues an entry, dropping it when the queue is full.
+
+        Args:
+            values (tuple): The entry values, in FIELDS order.
+        """
+        try:
+            self._queue.put_nowait(values)
+
+        except queue.Full:
+            self._drop(1)
+
+    def _drop(self, count: int):
+        """
+        Counts dropped entries, from the API threads and the writer thread.
+
+        Args:
+            count (int): The number of entries dropped.
+        """
+        with self._lock:
+            self.dropped += count
+
+        Metrics.inc('access_log_dropped_total', count)
+
+    def _write(self):
+        """
+        Writes queued entries in batches until stopped. The log file is reopened
+        for the next batch when it cannot be opened or written, dropping the batch.
+        """
+        logfile, failing = None, False
+
+        while True:
+            entries = [self._queue.get()]
+
+            # Take whatever else is pending, up to the batch size
+            while len(entries) < self._batch_size and entries[-1] is not None:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            entries, stopped = [entry for entry in entries if entry is not None], entries[-1] is None
+
+            try:
+                lines = b''.join(media.dumps(dict(zip(self.FIELDS, entry))) + b'\n' for entry in entries)
+
+                if logfile is None:
+                    os.makedirs(os.path.dirname(self._path), exist_ok=True)
+
+                    # Unbuffered, so each batch is appended with a single write, even alongside other API workers
+                    logfile = open(self._path, 'ab', buffering=0)
+
+                logfile.write(lines)
+                failing = False
+
+            except OSError:
+                # Log once until writes succeed again, rather than for every batch
+                if not failing:
+                    logger.exception(f'Could not write access log entries to {self._path}')
+
+                failing = True
+                self._drop(len(entries))
+
+                if logfile is not None:
+                    logfile.close()
+                    logfile = None
+
+            except (TypeError, ValueError):
+                logger.exception(f'Could not format access log entries for {self._path}')
+
+            if stopped:
+                if logfile is not None:
+                    logfile.close()
+                return
@@ -0,0 +1,158 @@
+# Batteries
+import asyncio
+import io
+import socket
+
+# Third-party Imports
+import falcon
+import falcon.asgi
+import falcon.util
+from loguru import logger
+
+# Optional Third-party Imports
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+
+class Request(falcon.asgi.Request):
+    """
+    An ASGI request whose body is read before the responder runs, so the
+    synchronous controllers access its media and stream as they would a WSGI
+    request's.
+    """
+    __slots__ = ('_body',)
+
+    async def prefetch(self):
+        """
+        Reads the whole request body.
+        """
+        self._body = io.BytesIO(await self.stream.read())
+
+    @property
+    def bounded_stream(self) -> io.BytesIO:
+        """
+        The prefetched request body.
+        """
+        return self._body
+
+    def get_media(self, *args, **kwargs):
+        """
+        Deserialises the prefetched request body, like falcon.Request.get_media.
+        """
+        return falcon.Request.get_media(self, *args, **kwargs)
+
+    media = property(get_media)
+
+
+class AsyncResource(object):
+    """
+    Exposes a controller's responders to the ASGI application.
+
+    Native coroutine responders, named after the responder with an '_async'
+    suffix, are used when the controller has them. Otherwise the synchronous
+    responders run on the asyncio datastore session when the controller sets
+    ASYNC_DATASTORE, as they do not block on thread locks, or on a worker
+    thread with a regular session. Streamed bodies are iterated likewise.
+    """
+
+    def __init__(self, controller):
+        """
+        Create the resource of a controller.
+
+        Args:
+            controller (object): The controller instance.
+        """
+        self._asyncdatastore = getattr(controller, 'ASYNC_DATASTORE', False)
+
+        for name in dir(controller):
+            if name.startswith('on_') and not name.endswith('_async'):
+                setattr(self, name, getattr(controller, f'{name}_async', None) or self._wrap(getattr(controller, name)))
+
+    def _wrap(self, responder):
+        """
+        Returns a coroutine running a synchronous responder.
+        """
+        async def respond(req: Request, resp: falcon.asgi.Response, **params):
+            await req.prefetch()
+
+            if self._asyncdatastore:
+                req.context.dbconn = req.context.asyncconn.sync_session
+                await req.context.asyncconn.run_sync(lambda session: responder(req, resp, **params))
+            else:
+                await falcon.util.sync_to_async(responder, req, resp, **params)
+
+            if resp.stream is not None and not hasattr(resp.stream, '__aiter__'):
+                resp.stream = self._iterate(req, resp.stream)
+
+        return respond
+
+    async def _iterate(self, req: Request, stream):
+        """
+        Iterates a synchronous body stream, closing it when done.
+        """
+        if self._asyncdatastore:
+            run = req.context.asyncconn.run_sync
+
+            def call(function, *args):
+                return run(lambda session: function(*args))
+        else:
+            def call(function, *args):
+                return falcon.util.sync_to_async(function, *args)
+
+        try:
+            while (chunk := await call(next, stream, None)) is not None:
+                yield chunk
+
+        finally:
+            if hasattr(stream, 'close'):
+                await call(stream.close)
+
+
+async def default_exception_handler_async(req: Request, resp: falcon.asgi.Response, ex: Exception, params: dict,
+                                          ws=None):
+    """
+    Default handler for any exception of the ASGI application, catches the exception and logs it with loguru.
+    """
+    logger.exception('Caught an unexpected exception', exception=ex)
+
+    raise falcon.HTTPInternalServerError(
+        title='Internal Server Error', description='An error occurred while processing your request.')
+
+
+def run(app: falcon.asgi.App, bind: str, port: int, reuse_port: bool = False, engine=None):
+    """
+    Serves an ASGI application with uvicorn until interrupted.
+
+    Args:
+        app (falcon.asgi.App): The ASGI application.
+        bind (str): The bind address.
+        port (int): The port to which to bind.
+        reuse_port (bool, optional): Whether to share the port with other processes. Defaults to False.
+        engine (sqlalchemy.ext.asyncio.AsyncEngine, optional): The asyncio datastore engine, disposed
+            before the event loop closes.
+    """
+    if uvicorn is None:
+        raise RuntimeError('The uvicorn server requires the uvicorn package')
+
+    # Requests are logged by the LoggingMiddleware
+    server = uvicorn.Server(uvicorn.Config(app, host=bind, port=port, log_config=None, access_log=False))
+    sockets = None
+
+    # Bind the shared port, which uvicorn does not
+    if reuse_port:
+        sock = socket.socket(socket.AF_INET6 if ':' in bind else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((bind, port))
+        sockets = [sock]
+
+    async def serve():
+        try:
+            await server.serve(sockets)
+        finally:
+            if engine is not None:
+                await engine.dispose()
+
+    asyncio.run(serve())
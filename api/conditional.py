@@ -0,0 +1,28 @@
+# Third-party Imports
+import falcon
+
+
+def notmodified(req: falcon.Request, resp: falcon.Response, version: int) -> bool:
+    """
+    Tags the response with the dataset version as a strong ETag and answers
+    304 Not Modified when the request's If-None-Match already holds it.
+
+    The dataset version is the journal head, which every committed write
+    advances, so a representation at a given URL only changes along with it.
+
+    Args:
+        req (falcon.Request): The request object.
+        resp (falcon.Response): The response object.
+        version (int): The dataset version.
+
+    Returns:
+        bool: Whether the response was set to 304 Not Modified.
+    """
+    resp.etag = str(version)
+
+    # Weak comparison, as required for If-None-Match
+    if any(tag == '*' or tag == resp.etag.strip('"') for tag in req.if_none_match or ()):
+        resp.status = falcon.HTTP_304
+        return True
+
+    return False
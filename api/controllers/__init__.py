@@ -1,5 +1,10 @@
 # Local imports
 from .record import RecordController
+from .bulk import BulkRecordController
+from .change import ChangeController
+from .watch import WatchController
+from .zone import ZoneController
+from .metrics import MetricsController
 
 # The base point for each route
 BASE_ENDPOINT = '/api'
@@ -10,5 +15,22 @@ ROUTES = {
     # Zone Controller
     '/record': RecordController,
     '/record/{rtype}': RecordController,
-    '/record/{rtype}/{rname}': RecordController
+    '/record/{rtype}/{rname}': RecordController,
+
+    # Bulk Record Controller
+    '/records/bulk': BulkRecordController,
+
+    # Change Controller
+    '/changes': ChangeController,
+
+    # Watch Controller
+    '/record/watch': WatchController,
+
+    # Zone Controller
+    '/zone': ZoneController,
+    '/zone/{zone}': ZoneController,
+    '/zone/{zone}/changes': ChangeController,
+
+    # Metrics Controller
+    '/metrics': MetricsController,
 }
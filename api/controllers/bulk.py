@@ -0,0 +1,308 @@
+# Batteries
+import itertools
+
+# Third-party Imports
+import falcon
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+# Local Imports
+from api import media
+from api.notifier import ChangeNotifier
+from api.snapshot import RecordSnapshot
+from config import Config
+from models import Record, Change, writing
+from utils.validator import RecordValidator, InvalidDNSRecord, InvalidDNSRecordType
+
+
+def rkey(record: dict) -> tuple:
+    """
+    Returns the record's identity, matching its primary key.
+    """
+    return record['rname'], record['rtype'], record['rdata']
+
+
+class BulkRecordController(object):
+    """
+    Represents the bulk Record controller which handles many Record changes per request.
+
+    Records are sent either as a JSON array or as a NDJSON stream (one JSON
+    object per line, with the 'application/x-ndjson' content type) and applied
+    in one transaction and one statement per batch. Invalid records are reported by their
+    position in the request and do not prevent the others from being applied.
+    """
+    # Number of records applied per transaction
+    BATCH_SIZE = 1000
+
+    # Content type of newline-delimited JSON streams
+    MEDIA_NDJSON = 'application/x-ndjson'
+
+    # Number of bytes read at once from NDJSON streams
+    CHUNK_SIZE = 65536
+
+    @classmethod
+    def _batches(cls, req: falcon.Request):
+        """
+        Yields the request records in batches of (index, record) pairs. Lines of
+        a NDJSON stream which are not valid JSON are yielded as None.
+
+        Args:
+            req (falcon.Request): The request object.
+        """
+        if req.content_type and req.content_type.startswith(cls.MEDIA_NDJSON):
+            items = (cls._loads(line) for line in cls._lines(req.bounded_stream) if line.strip())
+
+        else:
+            items = req.get_media(default_when_empty=None)
+
+            if not isinstance(items, list):
+                raise falcon.HTTPBadRequest(
+                    title='Invalid Body', description='Request body must be a JSON array of records.')
+
+        items = enumerate(items)
+
+        while batch := list(itertools.islice(items, cls.BATCH_SIZE)):
+            yield batch
+
+    @classmethod
+    def _lines(cls, stream):
+        """
+        Yields the lines of a stream, reading it in chunks.
+
+        Args:
+            stream (falcon.stream.BoundedStream): The request body stream.
+        """
+        buffer = b''
+
+        while chunk := stream.read(cls.CHUNK_SIZE):
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+            yield from lines
+
+        yield buffer
+
+    @staticmethod
+    def _loads(line: bytes):
+        """
+        Parses a NDJSON line, returning None when invalid.
+        """
+        try:
+            return media.loads(line)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _error(index: int, title: str, description: str) -> dict:
+        """
+        Builds a per-record error.
+        """
+        return {'index': index, 'title': title, 'description': description}
+
+    @classmethod
+    def _params(cls, index: int, item, keys: tuple, errors: list) -> tuple:
+        """
+        Retrieves record parameters, reporting an error when missing or of the wrong type.
+        The optional 'rdata' and 'ttl' parameters are type checked too when given.
+
+        Returns:
+            tuple: The parameter values, None on error.
+        """
+        try:
+            if not isinstance(item, dict):
+                raise InvalidDNSRecord('Record must be a JSON object.')
+
+            params = tuple(item[k] for k in keys)
+
+            for key in sorted(set(keys) | {'rdata'} & set(item)):
+                if not isinstance(item[key], str):
+                    raise InvalidDNSRecord(f'Record \'{key}\' must be a string.')
+
+            if item.get('ttl') is not None and (not isinstance(item['ttl'], int) or isinstance(item['ttl'], bool)):
+                raise InvalidDNSRecord('Record \'ttl\' must be an integer.')
+
+            return params
+
+        except KeyError as e:
+            errors.append(cls._error(index, 'Missing Body Parameters', f'Missing \'{str(e)}\' in the record.'))
+
+        except InvalidDNSRecord as e:
+            errors.append(cls._error(index, 'Bad Request', str(e)))
+
+    def on_post(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Handles POST requests, creating records.
+        """
+        created, errors = 0, []
+
+        for batch in self._batches(req):
+            records, keys = [], set()
+
+            # Validate batch records
+            for index, item in batch:
+                params = self._params(index, item, ('rname', 'rtype', 'rdata'), errors)
+
+                if not params:
+                    continue
+
+                try:
+                    zone = RecordValidator.validate(*params)
+                    ttl = RecordValidator.validatettl(item.get('ttl', Config.get('default-record-ttl', 3600)))
+                except (InvalidDNSRecord, InvalidDNSRecordType) as e:
+                    errors.append(self._error(index, 'Conflict', str(e)))
+                    continue
+
+                # Catch duplicates within the request
+                if params in keys:
+                    errors.append(self._error(index, 'Conflict', 'Record already exists.'))
+                    continue
+
+                keys.add(params)
+                records.append((index, {
+                    'rname': params[0], 'rtype': params[1], 'rdata': params[2], 'zone': zone,
+                    'ttl': ttl}))
+
+            created += self._insert(req.context.dbconn, records, errors)
+
+        resp.status, resp.media = falcon.HTTP_200, {'created': created, 'errors': errors}
+
+    def on_delete(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Handles DELETE requests, deleting records by type and name, or by type,
+        name and data when 'rdata' is given.
+        """
+        deleted, errors = 0, []
+
+        for batch in self._batches(req):
+            changes = []
+
+            try:
+                writing(req.context.dbconn)
+
+                for index, item in batch:
+                    params = self._params(index, item, ('rname', 'rtype'), errors)
+
+                    if not params:
+                        continue
+
+                    where = {'rname': params[0], 'rtype': params[1]}
+                    if item.get('rdata'):
+                        where['rdata'] = item['rdata']
+
+                    # Keep deleted record keys for the journal tombstones
+                    previous = req.context.dbconn.query(Record.rdata, Record.zone).filter_by(**where) \
+                        .with_for_update().all()
+                    req.context.dbconn.query(Record).filter_by(**where).delete(synchronize_session=False)
+                    changes.extend(
+                        {'rname': params[0], 'rtype': params[1], 'rdata': p.rdata, 'zone': p.zone} for p in previous)
+
+                # Journal and commit batch
+                seq = Change.extend(req.context.dbconn, Change.DELETE, changes) if changes else None
+                req.context.dbconn.commit()
+
+            except SQLAlchemyError as e:
+
+                # Rollback transaction
+                req.context.dbconn.rollback()
+
+                # Raise 500 internal server error
+                raise falcon.HTTPInternalServerError(
+                    title='Internal Server Error', description=f'Message: {str(e)} ({deleted} records deleted)')
+
+            # Update snapshot and wake up watchers
+            if seq:
+                RecordSnapshot.patch(req.context.dbconn, seq, len(changes), deletes=[rkey(c) for c in changes])
+                ChangeNotifier.notify(seq)
+
+            deleted += len(changes)
+
+        resp.status, resp.media = falcon.HTTP_200, {'deleted': deleted, 'errors': errors}
+
+    def _insert(self, dbconn, records: list, errors: list) -> int:
+        """
+        Inserts a batch of validated records in one transaction, reporting
+        already existing ones.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            records (list): The (index, record) pairs to insert.
+            errors (list): The per-record errors to append to.
+
+        Returns:
+            int: The number of inserted records.
+        """
+        try:
+            writing(dbconn)
+
+            # Skip already existing records
+            existing = set(dbconn.query(Record.rname, Record.rtype, Record.rdata).filter(
+                Record.rname.in_(list({r['rname'] for _, r in records}))).all()) if records else set()
+
+            for index, record in records:
+                if rkey(record) in existing:
+                    errors.append(self._error(index, 'Conflict', 'Record already exists.'))
+
+            records = [(i, r) for i, r in records if rkey(r) not in existing]
+
+            if not records:
+                dbconn.rollback()
+                return 0
+
+            # Add records and their journal entries and commit database transaction
+            try:
+                with dbconn.begin_nested():
+                    dbconn.execute(insert(Record), [r for _, r in records])
+
+            # Insert records one at a time to report those which are rejected
+            except IntegrityError:
+                records = [(i, r) for i, r in records if self._insertone(dbconn, i, r, errors)]
+
+                if not records:
+                    dbconn.rollback()
+                    return 0
+
+            seq = Change.extend(dbconn, Change.UPSERT, [r for _, r in records])
+            dbconn.commit()
+
+        except SQLAlchemyError as e:
+
+            # Rollback transaction
+            dbconn.rollback()
+
+            # Raise 500 internal server error
+            raise falcon.HTTPInternalServerError(title='Internal Server Error', description=f'Message: {str(e)}')
+
+        # Update snapshot and wake up watchers
+        RecordSnapshot.patch(dbconn, seq, len(records), upserts=[rkey(r) for _, r in records])
+        ChangeNotifier.notify(seq)
+
+        return len(records)
+
+    def _insertone(self, dbconn, index: int, record: dict, errors: list) -> bool:
+        """
+        Inserts a record of a batch whose insert was rejected, reporting it when rejected too.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session, in the batch transaction.
+            index (int): The record's position in the request.
+            record (dict): The record.
+            errors (list): The per-record errors to append to.
+
+        Returns:
+            bool: Whether the record was inserted.
+        """
+        try:
+            with dbconn.begin_nested():
+                dbconn.execute(insert(Record), [record])
+
+        except IntegrityError as e:
+
+            # Tell records created concurrently from those the datastore does not accept
+            if dbconn.query(Record.rname).filter_by(
+                    rname=record['rname'], rtype=record['rtype'], rdata=record['rdata']).first():
+                errors.append(self._error(index, 'Conflict', 'Record was concurrently created.'))
+            else:
+                errors.append(self._error(index, 'Bad Request', f'Record was rejected: {str(e.orig)}'))
+
+            return False
+
+        return True
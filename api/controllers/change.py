@@ -0,0 +1,88 @@
+# Third-party Imports
+import falcon
+
+# Local Imports
+from api.conditional import notmodified
+from api.metrics import Metrics
+from models import Change
+
+
+class ChangeController(object):
+    """
+    Represents the Change controller which exposes the record change journal.
+    """
+    # Maximum number of journal entries returned per request
+    MAX_LIMIT = 10000
+
+    # Responders run on the ASGI application's asyncio datastore session, as they do not block on thread locks
+    ASYNC_DATASTORE = True
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response, zone: str = None):
+        """
+        Handles GET requests.
+
+        Returns the journal entries with a sequence number greater than the 'since'
+        cursor, oldest first, only those of a zone when given. Responds with 410 Gone when the cursor is older than
+        the retained journal or ahead of it, in which case the client must fully resync.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+            zone (str, optional): The zone to return the changes of.
+        """
+        since = req.get_param_as_int('since', min_value=0, default=0)
+        limit = req.get_param_as_int('limit', min_value=1, max_value=self.MAX_LIMIT, default=self.MAX_LIMIT)
+
+        self._changes(req, resp, since, limit, zone)
+
+    @staticmethod
+    def _head(req: falcon.Request, since: int) -> int:
+        """
+        Returns the journal head, raising 410 Gone when the cursor is not within the retained journal.
+
+        Args:
+            req (falcon.Request): The request object.
+            since (int): The client's journal cursor.
+        """
+        head, tail = Change.head(req.context.dbconn), Change.tail(req.context.dbconn)
+        if since > head or (tail and since < tail - 1):
+            Metrics.inc('journal_reads_total', result='expired')
+            raise falcon.HTTPGone(
+                title='Cursor Expired', description=f'Changes after {since} are no longer in the journal.')
+
+        return head
+
+    def _changes(self, req: falcon.Request, resp: falcon.Response, since: int, limit: int, zone: str = None):
+        """
+        Responds with the journal entries after a cursor.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+            since (int): The client's journal cursor.
+            limit (int): The maximum number of entries to return.
+            zone (str, optional): Only return the entries of this zone.
+        """
+        # Check whether the requested changes are still retained and whether any was added since the client's copy
+        head = self._head(req, since)
+        if notmodified(req, resp, head):
+            Metrics.inc('journal_reads_total', result='notmodified')
+            return
+
+        Metrics.inc('journal_reads_total', result='changes')
+
+        where = [Change.seq > since]
+        if zone:
+            where.append(Change.zone == zone)
+
+        # For each change retrieved from database
+        changes = [c.todict() for c in
+                   req.context.dbconn.query(Change).filter(*where).order_by(Change.seq).limit(limit)]
+        more = len(changes) == limit
+
+        # Move the cursor past the other zones' entries once all were returned
+        resp.status, resp.media = falcon.HTTP_200, {
+            'changes': changes,
+            'seq': changes[-1]['seq'] if more else max(head, changes[-1]['seq'] if changes else 0),
+            'more': more,
+        }
@@ -0,0 +1,32 @@
+# Third-party Imports
+import falcon
+from sqlalchemy import func
+
+# Local Imports
+from api.metrics import Metrics
+from api.snapshot import RecordSnapshot
+from models import Record, Change
+
+
+class MetricsController(object):
+    """
+    Represents the Metrics controller which exposes the master's metrics in the Prometheus text format.
+    """
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Handles GET requests.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+        """
+        # Count records from the snapshot when built, otherwise from the datastore
+        counts = RecordSnapshot.counts() if RecordSnapshot.enabled() else None
+        if counts is None:
+            counts = req.context.dbconn.query(func.count(), func.count(Record.zone.distinct())).one()
+
+        resp.status, resp.content_type = falcon.HTTP_200, 'text/plain; version=0.0.4; charset=utf-8'
+        resp.text = Metrics.render(
+            records=counts[0], zones=counts[1],
+            journal_head=Change.head(req.context.dbconn), journal_tail=Change.tail(req.context.dbconn))
@@ -1,11 +1,20 @@
+# Batteries
+import concurrent.futures
+
 # Third-party Imports
 import falcon
-import sqlalchemy
+from loguru import logger
+from sqlalchemy import tuple_
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 # Local Imports
+from api import media
+from api.conditional import notmodified
+from api.coordinator import WriteCoordinator
+from api.notifier import ChangeNotifier
+from api.snapshot import RecordSnapshot
 from config import Config
-from models import Record
+from models import Record, Change, writing
 from utils.validator import RecordValidator, InvalidDNSRecord, InvalidDNSRecordType
 
 
@@ -13,60 +22,171 @@ class RecordController(object):
     """
     Represents the Record controller which handles Record CRUD requests.
     """
-    def on_get(self, req: falcon.Request, resp: falcon.Response, rtype: str = None, rname: str = None):
+    # Number of records fetched and serialised at once while streaming listings
+    BATCH_SIZE = 1000
+
+    # Record fields in listings
+    FIELDS = ('rname', 'rtype', 'rdata', 'ttl', 'zone', 'created', 'updated')
+
+    # Maximum number of records per listing page
+    MAX_LIMIT = 10000
+
+    @classmethod
+    def _stream(cls, dbconn, seq: int, where: list):
         """
-        Handles GET requests.
+        Streams a record listing as a JSON document, fetching and serialising the
+        records in batches so memory stays bounded regardless of the listing size.
+
+        The stream outlives the request's middleware, so it owns the database
+        session from then on and closes it when done.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            seq (int): The journal head to report.
+            where (list): The SQL filter criteria.
+
+        Yields:
+            bytes: The JSON document chunks.
         """
-        where = []
+        try:
+            yield f'{{"seq": {seq}, "records": ['.encode()
+
+            rows = dbconn.query(*[getattr(Record, f) for f in cls.FIELDS]) \
+                .filter(*where).yield_per(cls.BATCH_SIZE)
+            batch, separator = [], b''
+
+            for row in rows:
+                batch.append(media.dumps(dict(zip(cls.FIELDS, row))))
+
+                if len(batch) == cls.BATCH_SIZE:
+                    yield separator + b','.join(batch)
+                    batch, separator = [], b','
+
+            yield (separator if batch else b'') + b','.join(batch) + b']}'
+
+        except SQLAlchemyError:
+            logger.exception('Aborted record listing stream')
+
+        finally:
+            dbconn.close()
+
+    @classmethod
+    def listing(cls, req: falcon.Request, resp: falcon.Response, rtype: str = None, rname: str = None,
+                zone: str = None):
+        """
+        Responds with the records matching the given filters and the 'updated' query parameter.
+
+        When the 'limit' query parameter is given, records are paged in primary key
+        order. The 'next' cursor of a full page is sent back as the 'after' query
+        parameter (formatted as 'rname,rtype,rdata') to get the following page.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+            rtype (str, optional): Only list records of this type.
+            rname (str, optional): Only list records with this name.
+            zone (str, optional): Only list records of this zone.
+        """
+        where, updated, after = [], 0, None
+        limit = req.get_param_as_int('limit', min_value=1, max_value=cls.MAX_LIMIT)
 
         # Check if record type is specified
         if rtype:
-            where.append(f'rtype = "{rtype}"')
+            where.append(Record.rtype == rtype)
 
         # Check if record name is specified
         if rname:
-            where.append(f'rname = "{rname}"')
+            where.append(Record.rname == rname)
+
+        # Check if record zone is specified
+        if zone:
+            where.append(Record.zone == zone)
 
         # Check for updated parameter
         if 'updated' in req.params and str(req.params['updated']).isnumeric() and int(req.params['updated']) > 0:
-            where.append(f'updated > {int(req.params["updated"])}')
+            updated = int(req.params['updated'])
+            where.append(Record.updated > updated)
 
-        # For each record retrieved from database
-        records = [r.todict() for r in
-                   req.context.dbconn.query(Record).filter(sqlalchemy.text(' AND '.join(where))).all()]
+        # Check for page cursor parameter, split from the right as only names may hold commas
+        if req.get_param('after'):
+            after = tuple(req.get_param('after').rsplit(',', 2))
 
-        resp.status, resp.media = falcon.HTTP_200, {'records': records}
+            if len(after) != 3:
+                raise falcon.HTTPBadRequest(
+                    title='Invalid Query Parameters', description='Cursor must be formatted as \'rname,rtype,rdata\'.')
 
-    def on_post(self, req: falcon.Request, resp: falcon.Response, rtype: str = None):
+        # Serve records from the in-memory snapshot, unless nothing changed since the client's copy
+        if RecordSnapshot.enabled():
+            seq, body = RecordSnapshot.listing(req.context.dbconn, rtype, rname, zone, updated, limit, after,
+                                               lambda seq: notmodified(req, resp, seq))
+
+            if body is not None:
+                resp.status, resp.content_type, resp.data = falcon.HTTP_200, falcon.MEDIA_JSON, body
+
+            return
+
+        # Read journal head before the records so any later change is replayed by delta consumers
+        seq = Change.head(req.context.dbconn)
+
+        # Nothing changed since the client's copy
+        if notmodified(req, resp, seq):
+            return
+
+        # Page records retrieved from database, in primary key order
+        if limit:
+            key = (Record.rname, Record.rtype, Record.rdata)
+            if after:
+                where.append(tuple_(*key) > tuple_(*after))
+
+            rows = req.context.dbconn.query(*[getattr(Record, f) for f in cls.FIELDS]).filter(*where) \
+                .order_by(*key).limit(limit).all()
+
+            resp.status, resp.media = falcon.HTTP_200, {
+                'seq': seq,
+                'records': [dict(zip(cls.FIELDS, row)) for row in rows],
+                'next': ','.join(rows[-1][:3]) if len(rows) == limit else None,
+            }
+            return
+
+        # Stream records retrieved from database
+        resp.status, resp.content_type = falcon.HTTP_200, falcon.MEDIA_JSON
+        resp.stream = cls._stream(req.context.dbconn, seq, where)
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response, rtype: str = None, rname: str = None):
         """
-        Handles POST requests.
+        Handles GET requests.
         """
-        # Check URL parameters
-        if not rtype:
-            raise falcon.HTTPBadRequest(
-                title='Missing URL Parameters', description='Resource type identifier is required in the URL.')
+        self.listing(req, resp, rtype, rname)
 
-        try:
-            # Retrieve body parameters
-            rname, rdata, ttl = req.media['rname'], req.media['rdata'], \
-                                req.media.get('ttl', Config.get('default-record-ttl', 3600))
+    @staticmethod
+    def _write(req: falcon.Request, mutation):
+        """
+        Applies a record mutation and commits it, along with those of concurrent requests when
+        the write coordinator is enabled, then updates the snapshot and wakes up watchers.
 
-            # Validate record
-            RecordValidator.validate(rname, rtype, rdata)
+        Args:
+            req (falcon.Request): The request object.
+            mutation (callable): Applies the mutation given a database session, returning its journal
+                entries, the (rname, rtype, rdata) keys of upserted and deleted records, and its result.
 
-            # Create record entity
-            record = Record(rname=rname, rtype=rtype, ttl=ttl, rdata=rdata)
+        Returns:
+            object: The mutation's result.
+        """
+        try:
+            if WriteCoordinator.enabled():
+                return WriteCoordinator.submit(mutation)
 
-            # Add and commit database transaction
-            req.context.dbconn.add(record)
+            # Apply mutation, journal and commit database transaction
+            writing(req.context.dbconn)
+            changes, upserts, deletes, result = mutation(req.context.dbconn)
+            seq = Change.append(req.context.dbconn, *changes) if changes else None
             req.context.dbconn.commit()
 
-        except KeyError as e:
-            raise falcon.HTTPBadRequest(
-                title='Missing Body Parameters', description=f'Missing \'{str(e)}\' in the request body.')
+        except concurrent.futures.TimeoutError:
 
-        except (InvalidDNSRecord, InvalidDNSRecordType) as e:
-            raise falcon.HTTPConflict(title='Conflict', description=str(e))
+            # Raise 503 service unavailable
+            raise falcon.HTTPServiceUnavailable(
+                title='Service Unavailable', description='The write was not committed in time and may not be applied.')
 
         except IntegrityError:
 
@@ -84,11 +204,51 @@ class RecordController(object):
             # Raise 500 internal server error
             raise falcon.HTTPInternalServerError(title='Internal Server Error', description=f'Message: {str(e)}')
 
+        # Update snapshot and wake up watchers
+        if changes:
+            RecordSnapshot.patch(req.context.dbconn, seq, len(changes), upserts=upserts, deletes=deletes)
+            ChangeNotifier.notify(seq)
+
+        return result
+
+    def on_post(self, req: falcon.Request, resp: falcon.Response, rtype: str = None):
+        """
+        Handles POST requests.
+        """
+        # Check URL parameters
+        if not rtype:
+            raise falcon.HTTPBadRequest(
+                title='Missing URL Parameters', description='Resource type identifier is required in the URL.')
+
+        try:
+            # Retrieve body parameters
+            rname, rdata, ttl = req.media['rname'], req.media['rdata'], \
+                                req.media.get('ttl', Config.get('default-record-ttl', 3600))
+
+            # Validate record
+            zone = RecordValidator.validate(rname, rtype, rdata)
+            RecordValidator.validatettl(ttl)
+
+        except KeyError as e:
+            raise falcon.HTTPBadRequest(
+                title='Missing Body Parameters', description=f'Missing \'{str(e)}\' in the request body.')
+
+        except (InvalidDNSRecord, InvalidDNSRecordType) as e:
+            raise falcon.HTTPConflict(title='Conflict', description=str(e))
+
+        def create(dbconn) -> tuple:
+            # Add record along with its journal entry
+            dbconn.add(Record(rname=rname, rtype=rtype, ttl=ttl, rdata=rdata, zone=zone))
+
+            return [Change.upsert(rname, rtype, rdata, ttl, zone)], [(rname, rtype, rdata)], [], None
+
+        self._write(req, create)
+
         resp.status_code, resp.media = falcon.HTTP_201, {
-            'rname': record.rname,
-            'rtype': record.rtype,
-            'rdata': record.rdata,
-            'ttl': record.ttl,
+            'rname': rname,
+            'rtype': rtype,
+            'rdata': rdata,
+            'ttl': ttl,
         }
 
     def on_put(self, req: falcon.Request, resp: falcon.Response, rtype: str = None, rname: str = None):
@@ -111,20 +271,10 @@ class RecordController(object):
             # Retrieve body parameters
             values = {p: req.media.get(p) for p in ('rname', 'rdata', 'ttl') if req.media.get(p)}
 
-            # Validate record
-            RecordValidator.validate(values.get('rname', rname), rtype, values['rdata'])
-
-            # Add and commit database transaction
-            updated = req.context.dbconn.query(Record).filter_by(**where).update(values, synchronize_session=False)
-            req.context.dbconn.commit()
-
-            # If no rows were updated, insert
-            if updated == 0:
-
-                # Add and commit database transaction
-                req.context.dbconn.add(
-                    Record(rname=values.get('rname', rname), rtype=rtype, rdata=values['rdata'], ttl=values.get('ttl')))
-                req.context.dbconn.commit()
+            # Validate record and store its zone
+            values['zone'] = RecordValidator.validate(values.get('rname', rname), rtype, values['rdata'])
+            if 'ttl' in values:
+                RecordValidator.validatettl(values['ttl'])
 
         except KeyError as e:
             raise falcon.HTTPBadRequest(
@@ -133,21 +283,34 @@ class RecordController(object):
         except (InvalidDNSRecord, InvalidDNSRecordType) as e:
             raise falcon.HTTPConflict(title='Conflict', description=str(e))
 
-        except IntegrityError:
+        upserts = [(values.get('rname', rname), rtype, values['rdata'])]
 
-            # Rollback transaction
-            req.context.dbconn.rollback()
+        def update(dbconn) -> tuple:
+            # Keep previous record keys to journal the replaced ones
+            previous = dbconn.query(Record.rdata, Record.ttl, Record.zone).filter_by(**where).with_for_update().all()
 
-            # Raise 409 conflict
-            raise falcon.HTTPConflict(title='Conflict', description='Record already exists.')
+            # Update records
+            updated = dbconn.query(Record).filter_by(**where).update(values, synchronize_session=False)
 
-        except SQLAlchemyError as e:
+            # If no rows were updated, insert
+            if updated == 0:
+                record = Record(
+                    rname=values.get('rname', rname), rtype=rtype, rdata=values['rdata'], ttl=values.get('ttl'),
+                    zone=values['zone'])
+                dbconn.add(record)
+                dbconn.flush()
 
-            # Rollback transaction
-            req.context.dbconn.rollback()
+                return [Change.upsert(record.rname, rtype, record.rdata, record.ttl, record.zone)], upserts, [], None
 
-            # Raise 500 internal server error
-            raise falcon.HTTPInternalServerError(title='Internal Server Error', description=f'Message: {str(e)}')
+            # Otherwise tombstone replaced records and journal their new values
+            changes = [Change.tombstone(rname, rtype, p.rdata, p.zone) for p in previous] + [
+                Change.upsert(
+                    values.get('rname', rname), rtype, values['rdata'], values.get('ttl', p.ttl), values['zone'])
+                for p in previous]
+
+            return changes, upserts, [(rname, rtype, p.rdata) for p in previous], None
+
+        self._write(req, update)
 
         resp.status_code, resp.media = falcon.HTTP_200, {
             'rname': values.get('rname', rname),
@@ -178,18 +341,17 @@ class RecordController(object):
         # Save update statement where parameters
         where = {'rtype': rtype, 'rname': rname}
 
-        try:
-            # Delete rname and commit
-            deleted = req.context.dbconn.query(Record).filter_by(**where).delete(synchronize_session=False)
-            req.context.dbconn.commit()
+        def delete(dbconn) -> tuple:
+            # Keep deleted record keys for the journal tombstones
+            previous = dbconn.query(Record.rdata, Record.zone).filter_by(**where).with_for_update().all()
 
-            # Set response code and body
-            resp.status, resp.media = falcon.HTTP_204, {'deleted': deleted}
+            # Delete rname and tombstone the deleted records
+            deleted = dbconn.query(Record).filter_by(**where).delete(synchronize_session=False)
+            tombstones = [Change.tombstone(rname, rtype, p.rdata, p.zone) for p in previous] if deleted else []
 
-        except SQLAlchemyError as e:
+            return tombstones, [], [(rname, rtype, p.rdata) for p in previous], deleted
 
-            # Rollback transaction
-            req.context.dbconn.rollback()
+        deleted = self._write(req, delete)
 
-            # Raise 500 internal server error
-            raise falcon.HTTPInternalServerError(title='Internal Server Error', description=f'Message: {str(e)}')
+        # Set response code and body
+        resp.status, resp.media = falcon.HTTP_204, {'deleted': deleted}
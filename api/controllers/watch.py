@@ -0,0 +1,91 @@
+# Batteries
+import time
+
+# Third-party Imports
+import falcon
+
+# Local Imports
+from api.notifier import ChangeNotifier
+from api.snapshot import RecordSnapshot
+from .change import ChangeController
+
+
+class WatchController(ChangeController):
+    """
+    Represents the Watch controller which long-polls the record change journal.
+    """
+    # Maximum number of seconds a request is held
+    MAX_TIMEOUT = 300
+
+    # Seconds between journal head checks when other API workers write
+    POLL_INTERVAL = 1
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Handles GET requests.
+
+        Holds the request until the journal advances past the 'since' cursor or
+        the timeout expires, then responds like the change journal. Requests are
+        only held when the WSGI server handles requests concurrently, otherwise
+        they are answered right away. Writes committed by other API workers are
+        not notified, so the journal head is then checked every POLL_INTERVAL.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+        """
+        since = req.get_param_as_int('since', min_value=0, default=0)
+        limit = req.get_param_as_int('limit', min_value=1, max_value=self.MAX_LIMIT, default=self.MAX_LIMIT)
+        timeout = req.get_param_as_int('timeout', min_value=0, max_value=self.MAX_TIMEOUT, default=30)
+
+        # Wait for changes when there are none yet
+        if self._head(req, since) <= since and timeout and req.env.get('wsgi.multithread'):
+
+            # Release the database connection while waiting
+            req.context.dbconn.close()
+
+            interval = self.POLL_INTERVAL if RecordSnapshot.shared() else timeout
+            deadline = time.monotonic() + timeout
+
+            while not ChangeNotifier.wait(since, min(interval, deadline - time.monotonic())):
+                if time.monotonic() >= deadline or self._head(req, since) > since:
+                    break
+
+                req.context.dbconn.close()
+
+        self._changes(req, resp, since, limit)
+
+    async def on_get_async(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Handles GET requests in the ASGI application.
+
+        Like on_get, but waits on the event loop with the datastore session
+        released, so held requests take neither a thread nor a connection.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+        """
+        since = req.get_param_as_int('since', min_value=0, default=0)
+        limit = req.get_param_as_int('limit', min_value=1, max_value=self.MAX_LIMIT, default=self.MAX_LIMIT)
+        timeout = req.get_param_as_int('timeout', min_value=0, max_value=self.MAX_TIMEOUT, default=30)
+
+        req.context.dbconn = req.context.asyncconn.sync_session
+
+        async def head() -> int:
+            return await req.context.asyncconn.run_sync(lambda session: self._head(req, since))
+
+        # Wait for changes when there are none yet
+        if timeout and await head() <= since:
+            interval = self.POLL_INTERVAL if RecordSnapshot.shared() else timeout
+            deadline = time.monotonic() + timeout
+
+            await req.context.asyncconn.close()
+
+            while not await ChangeNotifier.wait_async(since, min(interval, deadline - time.monotonic())):
+                if time.monotonic() >= deadline or await head() > since:
+                    break
+
+                await req.context.asyncconn.close()
+
+        await req.context.asyncconn.run_sync(lambda session: self._changes(req, resp, since, limit))
@@ -0,0 +1,48 @@
+# Third-party Imports
+import falcon
+from sqlalchemy import func
+
+# Local Imports
+from api.conditional import notmodified
+from api.snapshot import RecordSnapshot
+from models import Record, Change
+from .record import RecordController
+
+
+class ZoneController(object):
+    """
+    Represents the Zone controller which lists the zones and their records.
+    """
+
+    def on_get(self, req: falcon.Request, resp: falcon.Response, zone: str = None):
+        """
+        Handles GET requests.
+
+        Lists the zones along with their number of records, or the records of
+        the given zone like the record controller.
+
+        Args:
+            req (falcon.Request): The request object.
+            resp (falcon.Response): The response object.
+            zone (str, optional): The zone to list the records of.
+        """
+        if zone:
+            return RecordController.listing(req, resp, zone=zone)
+
+        # Count zone records from the in-memory snapshot
+        if RecordSnapshot.enabled():
+            seq, zones = RecordSnapshot.zones(req.context.dbconn)
+
+        # Read journal head before the records so the counts are not older than it
+        else:
+            seq = Change.head(req.context.dbconn)
+            zones = dict(req.context.dbconn.query(Record.zone, func.count()).group_by(Record.zone).all())
+
+        # Nothing changed since the client's copy
+        if notmodified(req, resp, seq):
+            return
+
+        resp.status, resp.media = falcon.HTTP_200, {
+            'seq': seq,
+            'zones': [{'zone': z, 'records': zones[z]} for z in sorted(zones)],
+        }
@@ -0,0 +1,195 @@
+# Batteries
+import concurrent.futures
+import queue
+import threading
+import time
+
+# Third-party Imports
+import sqlalchemy.orm
+from loguru import logger
+
+# Local Imports
+from api.metrics import Metrics
+from api.notifier import ChangeNotifier
+from api.snapshot import RecordSnapshot
+from config import Config
+from models import Change, writing
+
+
+class WriteCoordinator(object):
+    """
+    Static class which commits the record mutations of concurrent requests
+    together (group commit), so a burst of writes pays for one transaction.
+
+    Mutations are queued and applied by a writer thread, each in its own
+    SAVEPOINT so a failing one, such as a conflicting insert, is rolled back
+    alone. The batch is committed once the interval after its first mutation
+    elapsed or it holds batch-size mutations, and each request then gets its
+    own result or exception. A request which waited longer than the timeout
+    gets a TimeoutError, its mutation being dropped unless already applied.
+    """
+    # Class parameters
+    _queue = None
+    _thread = None
+    _session = None
+    _interval = 0
+    _batch_size = 1
+    _timeout = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """
+        Whether the writer thread is running.
+        """
+        return cls._thread is not None and cls._thread.is_alive()
+
+    @classmethod
+    def start(cls, session_factory: sqlalchemy.orm.sessionmaker, interval: float = 0.002, batch_size: int = 100,
+              timeout: float = 30):
+        """
+        Starts the writer thread.
+
+        Args:
+            session_factory (sqlalchemy.orm.sessionmaker): The session factory, whose engine must nest SAVEPOINTs.
+            interval (float, optional): The seconds to wait for more mutations after the first of a batch.
+                Defaults to 0.002.
+            batch_size (int, optional): The maximum number of mutations committed together. Defaults to 100.
+            timeout (float, optional): The seconds a request waits for its batch to be committed. Defaults to 30.
+        """
+        cls._queue, cls._session = queue.Queue(), session_factory
+        cls._interval, cls._batch_size, cls._timeout = interval, batch_size, timeout
+        cls._thread = threading.Thread(target=cls._run, name='group-commit', daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls):
+        """
+        Commits the pending mutations and stops the writer thread.
+        """
+        cls._queue.put(None)
+        cls._thread.join()
+        cls._thread = None
+
+    @classmethod
+    def submit(cls, mutation):
+        """
+        Queues a mutation and waits for its batch to be committed.
+
+        Args:
+            mutation (callable): Applies the mutation given a database session, returning its journal
+                entries, the (rname, rtype, rdata) keys of upserted and deleted records, and its result.
+
+        Returns:
+            object: The mutation's result.
+
+        Raises:
+            concurrent.futures.TimeoutError: When the batch was not committed within the timeout.
+            Exception: The exception raised by the mutation, or by the batch commit.
+        """
+        future = concurrent.futures.Future()
+        cls._queue.put((mutation, future))
+
+        try:
+            return future.result(cls._timeout)
+
+        except concurrent.futures.TimeoutError:
+            # Drop the mutation, unless the writer thread already applies it
+            future.cancel()
+            raise
+
+    @classmethod
+    def _run(cls):
+        """
+        Commits queued mutations in batches until stopped.
+        """
+        while True:
+            batch = [cls._queue.get()]
+            deadline = time.monotonic() + cls._interval
+
+            # Gather the mutations submitted within the interval, up to the batch size
+            while batch[-1] is not None and len(batch) < cls._batch_size:
+                try:
+                    batch.append(cls._queue.get(timeout=max(0., deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            # Start the mutations, skipping those whose request timed out
+            items = [item for item in batch if item is not None and item[1].set_running_or_notify_cancel()]
+
+            try:
+                cls._commit(items)
+
+            # Fail the batch rather than the writer thread
+            except Exception as e:
+                logger.exception(f'Could not commit a batch of {len(items)} mutations')
+
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+            if batch[-1] is None:
+                return
+
+    @classmethod
+    def _commit(cls, batch: list):
+        """
+        Applies a batch of mutations in a single transaction.
+        """
+        if not batch:
+            return
+
+        dbconn = cls._session()
+        applied, count, seq, upserts, deletes = [], 0, None, [], []
+
+        try:
+            writing(dbconn)
+
+            for mutation, future in batch:
+                try:
+                    with dbconn.begin_nested():
+                        changes, mupserts, mdeletes, result = mutation(dbconn)
+                        mseq = Change.append(dbconn, *changes, prune=False) if changes else None
+
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+
+                applied.append((future, result))
+
+                if changes:
+                    count, seq = count + len(changes), mseq
+                    upserts.extend(mupserts)
+                    deletes.extend(mdeletes)
+
+            # Prune the journal once for the whole batch
+            if count:
+                Change.prune(dbconn, Config.int('cluster-master.journal-retention', 100000))
+
+            dbconn.commit()
+
+        except Exception as e:
+            logger.exception(f'Could not commit a batch of {len(batch)} mutations')
+            dbconn.rollback()
+            dbconn.close()
+
+            for future, result in applied:
+                future.set_exception(e)
+
+            return
+
+        Metrics.inc('group_commit_batches_total')
+        Metrics.inc('group_commit_mutations_total', len(batch))
+
+        # Update snapshot and wake up watchers, the batch being committed either way
+        if count:
+            try:
+                RecordSnapshot.patch(dbconn, seq, count, upserts=upserts, deletes=deletes)
+            except Exception:
+                logger.exception(f'Could not patch the record snapshot up to journal sequence {seq}')
+
+            ChangeNotifier.notify(seq)
+
+        dbconn.close()
+
+        for future, result in applied:
+            future.set_result(result)
@@ -0,0 +1,53 @@
+# Batteries
+import json
+
+# Third-party Imports
+import falcon
+
+# Optional Third-party Imports
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """
+    Serialises an object as compact JSON, with orjson when installed.
+
+    Args:
+        obj (object): The object to serialise.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    if orjson:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """
+    Parses a JSON document, with orjson when installed.
+
+    Args:
+        data (bytes|str): The JSON document.
+
+    Returns:
+        object: The parsed object.
+
+    Raises:
+        ValueError: When the document is not valid JSON.
+    """
+    if orjson:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def handler() -> falcon.media.JSONHandler:
+    """
+    Returns a media handler which (de)serialises JSON bodies with the functions above.
+    """
+    return falcon.media.JSONHandler(dumps=dumps, loads=loads)
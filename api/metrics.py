@@ -0,0 +1,192 @@
+# Batteries
+import threading
+import time
+
+# Third-party Imports
+import sqlalchemy
+
+
+class Metrics(object):
+    """
+    Static class which collects the master's metrics, exposed in the Prometheus
+    text format.
+
+    Counters and histograms are updated as requests are handled, gauges are
+    given when rendering.
+
+    Metrics are kept per process. When the API is served by several worker
+    processes, each exports its own series, labelled with its worker number,
+    and a scrape is answered by whichever worker accepts it, so series of a
+    worker are only refreshed by the scrapes it answers.
+    """
+    # Metric names prefix
+    PREFIX = 'unbound_cluster_'
+
+    # Histogram upper bounds, in seconds
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    # Metric types and descriptions
+    METRICS = {
+        'http_requests_total': ('counter', 'HTTP requests by route, method and status.'),
+        'http_request_duration_seconds': ('histogram', 'HTTP request latency by route and method.'),
+        'http_requests_in_flight': ('gauge', 'HTTP requests being handled.'),
+        'sql_query_duration_seconds': ('histogram', 'SQL statement latency by statement type.'),
+        'db_pool_size': ('gauge', 'Database connection pool size by engine (read, write).'),
+        'db_pool_checked_out': ('gauge', 'Database connections in use by engine (read, write).'),
+        'records': ('gauge', 'Number of records.'),
+        'zones': ('gauge', 'Number of zones.'),
+        'journal_head': ('gauge', 'Most recent change journal sequence number.'),
+        'journal_tail': ('gauge', 'Oldest retained change journal sequence number.'),
+        'journal_reads_total': ('counter', 'Change journal reads by result (changes, notmodified, expired).'),
+        'snapshot_reads_total': ('counter', 'Record snapshot reads by result (hit, build).'),
+        'snapshot_invalidations_total': ('counter', 'Record snapshot invalidations.'),
+        'compression_cache_total': ('counter', 'Compressed body cache lookups by result (hit, miss).'),
+        'group_commit_batches_total': ('counter', 'Record mutation batches committed by the write coordinator.'),
+        'group_commit_mutations_total': ('counter', 'Record mutations applied by the write coordinator.'),
+        'access_log_dropped_total': ('counter', 'Access log entries dropped while the queue was full.'),
+    }
+
+    # Class parameters
+    _lock = threading.Lock()
+    _values = {}
+    _pools = {}
+    _common = ()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        """
+        Returns the key of a metric's series.
+        """
+        return name, tuple(sorted(labels.items()))
+
+    @classmethod
+    def label(cls, **labels):
+        """
+        Sets labels added to every series of the process, such as its API worker number.
+
+        Args:
+            labels (dict): The labels.
+        """
+        cls._common = tuple(sorted(labels.items()))
+
+    @classmethod
+    def inc(cls, name: str, value: float = 1, **labels):
+        """
+        Increments a counter, or a gauge by a negative value.
+
+        Args:
+            name (str): The metric name, without prefix.
+            value (float, optional): The increment. Defaults to 1.
+            labels (dict): The series labels.
+        """
+        key = cls._key(name, labels)
+
+        with cls._lock:
+            cls._values[key] = cls._values.get(key, 0) + value
+
+    @classmethod
+    def observe(cls, name: str, value: float, **labels):
+        """
+        Records a histogram observation.
+
+        Args:
+            name (str): The metric name, without prefix.
+            value (float): The observed value.
+            labels (dict): The series labels.
+        """
+        key = cls._key(name, labels)
+
+        with cls._lock:
+            # Bucket counts, followed by the sum and the count of observations
+            series = cls._values.setdefault(key, [0] * (len(cls.BUCKETS) + 2))
+
+            for i, bound in enumerate(cls.BUCKETS):
+                if value <= bound:
+                    series[i] += 1
+
+            series[-2] += value
+            series[-1] += 1
+
+    @classmethod
+    def instrument(cls, engine: sqlalchemy.engine.Engine, role: str = 'write'):
+        """
+        Times the engine's SQL statements and reports its connection pool usage.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): The datastore engine.
+            role (str, optional): The engine's role, either 'read' or 'write'. Defaults to 'write'.
+        """
+        cls._pools[role] = engine.pool
+
+        # Statements are timed from their execution context, which failed statements simply drop
+        @sqlalchemy.event.listens_for(engine, 'before_cursor_execute')
+        def started(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context.query_start_time = time.perf_counter()
+
+        @sqlalchemy.event.listens_for(engine, 'after_cursor_execute')
+        def finished(conn, cursor, statement, parameters, context, executemany):
+            if context is not None and hasattr(context, 'query_start_time'):
+                cls.observe(
+                    'sql_query_duration_seconds', time.perf_counter() - context.query_start_time,
+                    statement=statement.lstrip().split(None, 1)[0].lower())
+
+    @classmethod
+    def _labels(cls, labels: tuple) -> str:
+        """
+        Formats series labels, along with the process labels.
+        """
+        labels = cls._common + labels
+
+        if not labels:
+            return ''
+
+        return '{' + ','.join(
+            '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in labels) + '}'
+
+    @classmethod
+    def render(cls, **gauges) -> str:
+        """
+        Renders every metric in the Prometheus text format.
+
+        Args:
+            gauges (dict): Gauge values collected by the caller, by metric name.
+
+        Returns:
+            str: The metrics exposition.
+        """
+        with cls._lock:
+            values = {k: list(v) if isinstance(v, list) else v for k, v in cls._values.items()}
+
+        for name, value in gauges.items():
+            values[(name, ())] = value
+
+        # Report the connection pools usage when the pool keeps track of it
+        for role, pool in cls._pools.items():
+            if hasattr(pool, 'checkedout'):
+                values[('db_pool_size', (('engine', role),))] = pool.size()
+                values[('db_pool_checked_out', (('engine', role),))] = pool.checkedout()
+
+        lines = []
+
+        for name, (kind, description) in cls.METRICS.items():
+            series = sorted(((labels, value) for (n, labels), value in values.items() if n == name), key=lambda s: s[0])
+
+            if not series:
+                continue
+
+            lines += [f'# HELP {cls.PREFIX}{name} {description}', f'# TYPE {cls.PREFIX}{name} {kind}']
+
+            for labels, value in series:
+                if kind != 'histogram':
+                    lines.append(f'{cls.PREFIX}{name}{cls._labels(labels)} {value}')
+                    continue
+
+                for bound, count in zip(cls.BUCKETS + ('+Inf',), value[:-2] + value[-1:]):
+                    lines.append(f'{cls.PREFIX}{name}_bucket{cls._labels(labels + (("le", bound),))} {count}')
+
+                lines.append(f'{cls.PREFIX}{name}_sum{cls._labels(labels)} {value[-2]}')
+                lines.append(f'{cls.PREFIX}{name}_count{cls._labels(labels)} {value[-1]}')
+
+        return '\n'.join(lines) + '\n'
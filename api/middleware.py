@@ -1,16 +1,52 @@
 # Batteries
+import collections
+import random
+import threading
 import time
+import zlib
 
 # Third-party Imports
 import falcon
+import falcon.util
+import sqlalchemy.ext.asyncio
 import sqlalchemy.orm
 from loguru import logger
 
+# Local Imports
+from .accesslog import AccessLog
+from .metrics import Metrics
+
+# Optional Third-party Imports
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 class LoggingMiddleware(object):
     """
-    Log every request received by the server.
+    Log every request received by the server, or a sample of them.
+
+    Requests are written to the access log when given, otherwise to the
+    application log, formatting messages only when a sink emits them.
     """
+    def __init__(self, sampling: dict = None, accesslog: AccessLog = None):
+        """
+        Create the middleware instance.
+
+        Args:
+            sampling (dict, optional): The fraction of requests to log by user agent or route
+                template, '*' being the default. Server errors are always logged. Defaults to logging all.
+            accesslog (AccessLog, optional): The access log writer.
+        """
+        self._sampling = sampling or {}
+        self._accesslog = accesslog
+
     def process_request(self, req: falcon.Request, resp: falcon.Response):
         """Process the request before routing it.
 
@@ -42,25 +78,104 @@ class LoggingMiddleware(object):
         """
         reqtime = round(float(time.time() - req.context.req_start_time), 3)
 
+        # Sample requests, keeping server errors
+        rate = self._sampling.get(req.user_agent, self._sampling.get(req.uri_template, self._sampling.get('*', 1)))
+        if rate < 1 and resp.status_code < 500 and random.random() >= rate:
+            return
+
+        if self._accesslog:
+            self._accesslog.log(
+                req.context.req_start_time, req.remote_addr, req.get_header('X-Forwarded-For'), req.method,
+                req.relative_uri, req.uri_template, resp.status_code, reqtime, req.user_agent)
+            return
+
         # Log slave requests as debug
-        if req.user_agent == 'unbound-cluster-slave':
-            logger.debug(f'{req.access_route} {req.method} {req.uri} {resp.status} {req_succeeded} {reqtime}')
-        else:
-            logger.info(f'{req.access_route} {req.method} {req.uri} {resp.status} {req_succeeded} {reqtime}')
+        logger.opt(lazy=True).log(
+            'DEBUG' if req.user_agent == 'unbound-cluster-slave' else 'INFO', '{}',
+            lambda: f'{req.access_route} {req.method} {req.uri} {resp.status} {req_succeeded} {reqtime}')
+
+    async def process_request_async(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Process the request before routing it, in the ASGI application.
+        """
+        self.process_request(req, resp)
+
+    async def process_response_async(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """
+        Post-processing of the response (after routing), in the ASGI application.
+        """
+        self.process_response(req, resp, resource, req_succeeded)
+
+
+class MetricsMiddleware(object):
+    """
+    Counts and times every request handled by the server.
+    """
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        """Process the request before routing it.
+
+        Args:
+            req: Request object that will eventually be
+                routed to an on_* responder method.
+            resp: Response object that will be routed to
+                the on_* responder.
+        """
+        req.context.metrics_start_time = time.perf_counter()
+        Metrics.inc('http_requests_in_flight')
+
+    def process_response(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """Post-processing of the response (after routing).
+
+        Args:
+            req: Request object.
+            resp: Response object.
+            resource: Resource object to which the request was
+                routed. May be None if no route was found
+                for the request.
+            req_succeeded: True if no exceptions were raised while
+                the framework processed and routed the request;
+                otherwise False.
+        """
+        route = req.uri_template or 'unmatched'
+
+        Metrics.inc('http_requests_in_flight', -1)
+        Metrics.inc('http_requests_total', route=route, method=req.method, status=resp.status_code)
+        Metrics.observe('http_request_duration_seconds', time.perf_counter() - req.context.metrics_start_time,
+                        route=route, method=req.method)
+
+    async def process_request_async(self, req: falcon.Request, resp: falcon.Response):
+        """
+        Process the request before routing it, in the ASGI application.
+        """
+        self.process_request(req, resp)
+
+    async def process_response_async(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """
+        Post-processing of the response (after routing), in the ASGI application.
+        """
+        self.process_response(req, resp, resource, req_succeeded)
 
 
 class SQLAlchemyMiddleware(object):
     """
-    Appends a SQLAlchemy connection to the database.
+    Appends a SQLAlchemy connection to the database, a read-only one for
+    safe requests when given.
     """
-    def __init__(self, session_manager: sqlalchemy.orm.scoping.scoped_session):
+    # Request methods served by the read-only sessions
+    READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, session_manager: sqlalchemy.orm.scoping.scoped_session,
+                 read_session_manager: sqlalchemy.orm.scoping.scoped_session = None):
         """
         Create the middleware instance.
 
         Args:
             session_manager (sqlalchemy.orm.scoping.scoped_session): The scoped session class.
+            read_session_manager (sqlalchemy.orm.scoping.scoped_session, optional): The scoped read-only
+                session class. Defaults to using the session class for every request.
         """
         self.Session = session_manager
+        self.ReadSession = read_session_manager or session_manager
 
     def process_resource(self, req: falcon.Request, resp:falcon.Response, resource, params: dict):
         """
@@ -77,7 +192,7 @@ class SQLAlchemyMiddleware(object):
                 that will be passed to the resource's responder
                 method as keyword arguments.
         """
-        req.context.dbconn = self.Session()
+        req.context.dbconn = (self.ReadSession if req.method in self.READ_METHODS else self.Session)()
 
     def process_response(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
         """
@@ -96,3 +211,288 @@ class SQLAlchemyMiddleware(object):
             if not req_succeeded:
                 req.context.dbconn.rollback()
             self.Session.remove()
+            self.ReadSession.remove()
+
+
+class AsyncSQLAlchemyMiddleware(object):
+    """
+    Appends SQLAlchemy connections to the database in the ASGI application: a
+    session for the controllers running on worker threads, and an asyncio
+    session for those running on the event loop.
+    """
+    def __init__(self, session_factory: sqlalchemy.orm.sessionmaker,
+                 async_session_factory: sqlalchemy.ext.asyncio.async_sessionmaker,
+                 read_session_factory: sqlalchemy.orm.sessionmaker = None):
+        """
+        Create the middleware instance.
+
+        Args:
+            session_factory (sqlalchemy.orm.sessionmaker): The session factory.
+            async_session_factory (sqlalchemy.ext.asyncio.async_sessionmaker): The asyncio session factory.
+            read_session_factory (sqlalchemy.orm.sessionmaker, optional): The read-only session factory,
+                used for safe requests. Defaults to using the session factory for every request.
+        """
+        self.Session = session_factory
+        self.AsyncSession = async_session_factory
+        self.ReadSession = read_session_factory or session_factory
+
+    async def process_resource(self, req: falcon.Request, resp: falcon.Response, resource, params: dict):
+        """
+        Process the request after routing.
+        Args:
+            req: Request object that will be passed to the
+                routed responder.
+            resp: Response object that will be passed to the
+                responder.
+            resource: Resource object to which the request was
+                routed.
+            params: A dict-like object representing any additional
+                params derived from the route's URI template fields,
+                that will be passed to the resource's responder
+                method as keyword arguments.
+        """
+        req.context.dbconn = (self.ReadSession if req.method in SQLAlchemyMiddleware.READ_METHODS else self.Session)()
+        req.context.asyncconn = self.AsyncSession()
+
+    async def process_response(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """
+        Post-processing of the response (after routing), closing the sessions,
+        which rolls back any uncommitted transaction.
+        Args:
+            req: Request object.
+            resp: Response object.
+            resource: Resource object to which the request was
+                routed. May be None if no route was found
+                for the request.
+            req_succeeded: True if no exceptions were raised while
+                the framework processed and routed the request;
+                otherwise False.
+        """
+        if hasattr(req.context, 'asyncconn'):
+            if req.context.dbconn is not req.context.asyncconn.sync_session:
+                await falcon.util.sync_to_async(req.context.dbconn.close)
+
+            await req.context.asyncconn.close()
+
+
+class BrotliCompressor(object):
+    """
+    Exposes a brotli compressor through the zlib compression object interface.
+    """
+    def __init__(self, level: int):
+        """
+        Create a brotli compressor.
+
+        Args:
+            level (int): The compression level, used as the brotli quality (0 to 11).
+        """
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compresses a chunk, returning the compressed bytes available so far.
+        """
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        """
+        Returns the remaining compressed bytes, ending the stream.
+        """
+        return self._compressor.finish()
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses response bodies with the encoding preferred by the server among
+    those accepted by the client, zstd and brotli being offered only when their
+    packages are installed. Streamed bodies are compressed as they are sent.
+
+    The most recently compressed bodies are kept, so repeatedly sent body objects,
+    such as the record snapshot's serialised listing and pages, are compressed once.
+    """
+    # Number of compressed bodies kept
+    CACHE_SIZE = 32
+
+    # Encodings by server preference, along with their compression object factories
+    ENCODINGS = {
+        **({'zstd': lambda level: zstandard.ZstdCompressor(level=level).compressobj()} if zstandard else {}),
+        **({'br': BrotliCompressor} if brotli else {}),
+        'gzip': lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+    }
+
+    def __init__(self, level: int = 6, threshold: int = 1024):
+        """
+        Create the middleware instance.
+
+        Args:
+            level (int, optional): The compression level. Defaults to 6.
+            threshold (int, optional): Bodies smaller than this number of bytes are sent uncompressed.
+                Defaults to 1024.
+        """
+        self._level = level
+        self._threshold = threshold
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encoding(self, req: falcon.Request) -> str:
+        """
+        Negotiates the response encoding from the Accept-Encoding header.
+
+        Returns:
+            str: The encoding, None when the client accepts none.
+        """
+        accepted = set()
+
+        for value in (req.get_header('Accept-Encoding') or '').split(','):
+            coding, _, params = value.strip().lower().partition(';')
+
+            # Skip codings refused with a zero quality value
+            try:
+                if float(params.strip().partition('q=')[2] or 1) == 0:
+                    continue
+            except ValueError:
+                continue
+
+            accepted.add(coding.strip())
+
+        return next((e for e in self.ENCODINGS if e in accepted or '*' in accepted), None)
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        """
+        Compresses a whole body, reusing a recent result for the same body object.
+        """
+        # Cached bodies are referenced, so their identities are not reused
+        key = (encoding, id(body))
+
+        with self._lock:
+            cached = self._cache.get(key)
+
+            if cached and cached[0] is body:
+                self._cache.move_to_end(key)
+                Metrics.inc('compression_cache_total', result='hit')
+                return cached[1]
+
+        Metrics.inc('compression_cache_total', result='miss')
+        compressor = self.ENCODINGS[encoding](self._level)
+        compressed = compressor.compress(body) + compressor.flush()
+
+        with self._lock:
+            self._cache[key] = (body, compressed)
+
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return compressed
+
+    def _stream(self, encoding: str, stream):
+        """
+        Compresses a streamed body, closing the original stream when done.
+        """
+        compressor = self.ENCODINGS[encoding](self._level)
+
+        try:
+            for chunk in stream:
+                if compressed := compressor.compress(chunk):
+                    yield compressed
+
+            yield compressor.flush()
+
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+
+    async def _stream_async(self, encoding: str, stream):
+        """
+        Compresses an asynchronously streamed body, closing the original stream when done.
+        """
+        compressor = self.ENCODINGS[encoding](self._level)
+
+        try:
+            async for chunk in stream:
+                if compressed := compressor.compress(chunk):
+                    yield compressed
+
+            yield compressor.flush()
+
+        finally:
+            if hasattr(stream, 'aclose'):
+                await stream.aclose()
+
+    def _negotiate(self, req: falcon.Request, resp: falcon.Response) -> str:
+        """
+        Returns the encoding of a compressible response, None when it should be sent as is.
+        """
+        if resp.status_code in (204, 304) or resp.get_header('Content-Encoding'):
+            return None
+
+        resp.append_header('Vary', 'Accept-Encoding')
+
+        return self._encoding(req)
+
+    def _compressbody(self, resp: falcon.Response, encoding: str, body: bytes) -> bool:
+        """
+        Compresses a whole body when it reaches the threshold.
+
+        Returns:
+            bool: Whether the body was compressed.
+        """
+        if not body or len(body) < self._threshold:
+            return False
+
+        resp.text, resp.data = None, self._compress(encoding, body)
+
+        return True
+
+    @staticmethod
+    def _label(resp: falcon.Response, encoding: str):
+        """
+        Labels a compressed response with its encoding.
+        """
+        # The compressed representation is only semantically equivalent to the tagged one
+        if resp.etag and not resp.etag.startswith('W/'):
+            resp.etag = f'W/{resp.etag}'
+
+        resp.set_header('Content-Encoding', encoding)
+
+    def process_response(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """
+        Post-processing of the response (after routing).
+        Args:
+            req: Request object.
+            resp: Response object.
+            resource: Resource object to which the request was
+                routed. May be None if no route was found
+                for the request.
+            req_succeeded: True if no exceptions were raised while
+                the framework processed and routed the request;
+                otherwise False.
+        """
+        encoding = self._negotiate(req, resp)
+
+        if not encoding:
+            return
+
+        if resp.stream is not None:
+            resp.stream = self._stream(encoding, resp.stream)
+
+        elif not self._compressbody(resp, encoding, resp.render_body()):
+            return
+
+        self._label(resp, encoding)
+
+    async def process_response_async(self, req: falcon.Request, resp: falcon.Response, resource, req_succeeded: bool):
+        """
+        Post-processing of the response (after routing), in the ASGI application.
+        """
+        encoding = self._negotiate(req, resp)
+
+        if not encoding:
+            return
+
+        if resp.stream is not None:
+            resp.stream = self._stream_async(encoding, resp.stream)
+
+        elif not self._compressbody(resp, encoding, await resp.render_body()):
+            return
+
+        self._label(resp, encoding)
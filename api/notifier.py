@@ -0,0 +1,78 @@
+# Batteries
+import asyncio
+import contextlib
+import threading
+
+
+class ChangeNotifier(object):
+    """
+    Static class which wakes up requests waiting for journal changes.
+
+    Only writes committed by this process are notified.
+    """
+    # Class parameters
+    _condition = threading.Condition()
+    _seq = 0
+    _events = set()
+
+    @classmethod
+    def notify(cls, seq: int):
+        """
+        Announces that the journal advanced up to a sequence number.
+
+        Args:
+            seq (int): The committed journal sequence number.
+        """
+        with cls._condition:
+            cls._seq = max(cls._seq, seq)
+            cls._condition.notify_all()
+
+            # Wake up coroutines from their event loop's thread
+            for loop, event in cls._events:
+                loop.call_soon_threadsafe(event.set)
+
+    @classmethod
+    def wait(cls, since: int, timeout: float) -> bool:
+        """
+        Blocks until the journal advances past a sequence number.
+
+        Args:
+            since (int): The sequence number already known by the caller.
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            bool: False if the timeout expired without changes.
+        """
+        with cls._condition:
+            return cls._condition.wait_for(lambda: cls._seq > since, timeout)
+
+    @classmethod
+    async def wait_async(cls, since: int, timeout: float) -> bool:
+        """
+        Waits until the journal advances past a sequence number, without blocking the event loop.
+
+        Args:
+            since (int): The sequence number already known by the caller.
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            bool: False if the timeout expired without changes.
+        """
+        loop, event = asyncio.get_running_loop(), asyncio.Event()
+        deadline = loop.time() + timeout
+
+        with cls._condition:
+            cls._events.add((loop, event))
+
+        try:
+            while cls._seq <= since and loop.time() < deadline:
+                event.clear()
+
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(event.wait(), deadline - loop.time())
+
+            return cls._seq > since
+
+        finally:
+            with cls._condition:
+                cls._events.discard((loop, event))
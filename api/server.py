@@ -0,0 +1,53 @@
+# Batteries
+import socketserver
+import wsgiref.simple_server
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    """
+    A WSGI server which handles each request in its own thread, so long-lived
+    requests such as watches do not block other clients.
+    """
+    daemon_threads = True
+
+
+class ReusePortWSGIServer(ThreadingWSGIServer):
+    """
+    A threaded WSGI server sharing its port with the other API workers, the
+    kernel balancing connections between them.
+    """
+    allow_reuse_port = True
+
+
+class QuietWSGIRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
+    """
+    A WSGI request handler which leaves request logging to the LoggingMiddleware.
+    """
+    def log_message(self, format, *args):
+        """
+        Override default behavior.
+        """
+        pass
+
+
+def threaded(app, bind: str, port: int, reuse_port: bool = False):
+    """
+    Serves a WSGI application with a thread per request until interrupted.
+
+    Args:
+        app (callable): The WSGI application.
+        bind (str): The bind address.
+        port (int): The port to which to bind.
+        reuse_port (bool, optional): Whether to share the port with other processes. Defaults to False.
+    """
+    def multithreaded(environ: dict, start_response):
+        """
+        Reports the threaded environment, which wsgiref handlers always declare as single-threaded.
+        """
+        environ['wsgi.multithread'] = True
+        return app(environ, start_response)
+
+    with wsgiref.simple_server.make_server(
+            bind, port, multithreaded, server_class=ReusePortWSGIServer if reuse_port else ThreadingWSGIServer,
+            handler_class=QuietWSGIRequestHandler) as httpd:
+        httpd.serve_forever()
@@ -0,0 +1,315 @@
+# Batteries
+import bisect
+import threading
+
+# Third-party Imports
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+# Local Imports
+from api import media
+from api.metrics import Metrics
+from config import Config
+from models import Record, Change
+
+
+class RecordSnapshot(object):
+    """
+    Static class which keeps an in-memory copy of the records table, indexed by
+    type, name and zone, along with the serialised records, so listings are
+    served without querying the datastore.
+
+    The snapshot is built on first use and patched by the controllers after
+    each committed write. A write whose journal entries do not directly follow
+    the snapshot's sequence number (e.g. committed by another process)
+    invalidates it, and it is rebuilt by the next read. When API workers share
+    the datastore, the snapshot is instead caught up from the journal before
+    each read.
+    """
+    # Record fields in listings
+    FIELDS = ('rname', 'rtype', 'rdata', 'ttl', 'zone', 'created', 'updated')
+
+    # Class parameters
+    _lock = threading.RLock()
+    _seq = None
+    _records = {}
+    _indexes = {}
+    _listing = None
+    _order = None
+    _pages = {}
+    _paged = 0
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """
+        Whether listings are served from the snapshot.
+        """
+        return bool(Config.get('cluster-master.snapshot', True))
+
+    @classmethod
+    def _add(cls, record: dict):
+        """
+        Adds a record to the snapshot and its indexes.
+        """
+        key = (record['rname'], record['rtype'], record['rdata'])
+        cls._remove(key)
+        cls._records[key] = (record, media.dumps(record))
+
+        for index in ('rtype', 'rname', 'zone'):
+            cls._indexes[index].setdefault(record[index], set()).add(key)
+
+    @classmethod
+    def _remove(cls, key: tuple):
+        """
+        Removes a record from the snapshot and its indexes.
+        """
+        record, _ = cls._records.pop(key, (None, None))
+
+        if record is None:
+            return
+
+        for index in ('rtype', 'rname', 'zone'):
+            keys = cls._indexes[index][record[index]]
+            keys.discard(key)
+            if not keys:
+                del cls._indexes[index][record[index]]
+
+    @classmethod
+    def _build(cls, dbconn):
+        """
+        Loads the whole records table, positioned at the journal head read beforehand.
+        """
+        cls._seq = Change.head(dbconn)
+        cls._records, cls._indexes = {}, {'rtype': {}, 'rname': {}, 'zone': {}}
+        cls._listing, cls._order, cls._pages, cls._paged = None, None, {}, 0
+
+        for row in dbconn.query(*[getattr(Record, f) for f in cls.FIELDS]).yield_per(1000):
+            cls._add(dict(zip(cls.FIELDS, row)))
+
+        logger.info(f'Built record snapshot of {len(cls._records)} records at journal sequence {cls._seq}.')
+
+    @classmethod
+    def _sync(cls, dbconn):
+        """
+        Builds the snapshot when missing, and brings it up to the journal head when shared.
+        """
+        if cls._seq is not None and cls.shared():
+            cls._catchup(dbconn)
+
+        Metrics.inc('snapshot_reads_total', result='hit' if cls._seq is not None else 'build')
+
+        if cls._seq is None:
+            cls._build(dbconn)
+
+    @classmethod
+    def listing(cls, dbconn, rtype: str = None, rname: str = None, zone: str = None, updated: int = 0,
+                limit: int = None, after: tuple = None, unchanged=None) -> tuple:
+        """
+        Returns a serialised record listing, as returned by the record controller.
+        Paged listings are ordered by record key, like the records primary key, and
+        kept serialised until the next write as long as they hold no more records
+        than the snapshot.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session, used to build the snapshot.
+            rtype (str, optional): Only list records of this type.
+            rname (str, optional): Only list records with this name.
+            zone (str, optional): Only list records of this zone.
+            updated (int, optional): Only list records updated after this unix timestamp.
+            limit (int, optional): Only list this many records, along with the cursor of the next page.
+            after (tuple, optional): Only list records whose (rname, rtype, rdata) key follows this one.
+            unchanged (callable, optional): Tells whether the client's copy at the snapshot's journal
+                sequence number is current, in which case the listing is not serialised.
+
+        Returns:
+            tuple: The journal sequence number of the snapshot and the JSON document bytes, None when unchanged.
+        """
+        with cls._lock:
+            cls._sync(dbconn)
+
+            # Nothing changed since the client's copy
+            if unchanged and unchanged(cls._seq):
+                return cls._seq, None
+
+            head = f'{{"seq": {cls._seq}, "records": ['.encode()
+
+            # Unfiltered listings are kept serialised until the next write
+            if not (rtype or rname or zone or updated or limit):
+                if cls._listing is None:
+                    cls._listing = head + b','.join(r[1] for r in cls._records.values()) + b']}'
+                return cls._seq, cls._listing
+
+            # Intersect the filtered indexes, smallest first
+            candidates = sorted(
+                (cls._indexes[index].get(value, set()) for index, value in
+                 (('rtype', rtype), ('rname', rname), ('zone', zone)) if value),
+                key=len)
+            keys = candidates[0].intersection(*candidates[1:]) if candidates else cls._records.keys()
+            keys = (k for k in keys if cls._records[k][0]['updated'] > updated)
+
+            if not limit:
+                return cls._seq, head + b','.join(cls._records[k][1] for k in keys) + b']}'
+
+            # Paged listings, such as those of slaves' full syncs, are kept serialised until the next write
+            paging = (rtype, rname, zone, updated, limit, after)
+            if paging in cls._pages:
+                return cls._seq, cls._pages[paging]
+
+            page = cls._page(keys if candidates or updated else None, limit, after)
+            cursor = ','.join(page[-1]) if len(page) == limit else None
+            body = head + b','.join(cls._records[k][1] for k in page) + b'],"next":' + media.dumps(cursor) + b'}'
+
+            if cls._paged + len(page) <= len(cls._records):
+                cls._pages[paging], cls._paged = body, cls._paged + len(page)
+
+            return cls._seq, body
+
+    @classmethod
+    def _page(cls, keys, limit: int, after: tuple = None) -> list:
+        """
+        Returns a page of record keys in key order.
+
+        Args:
+            keys (iterable): The filtered record keys, None for all the records.
+            limit (int): The page size.
+            after (tuple, optional): The key preceding the page.
+        """
+        if keys is not None:
+            return sorted(k for k in keys if not after or k > after)[:limit]
+
+        # All the records are kept in key order until the next write
+        if cls._order is None:
+            cls._order = sorted(cls._records)
+
+        start = bisect.bisect_right(cls._order, after) if after else 0
+
+        return cls._order[start:start + limit]
+
+    @classmethod
+    def counts(cls) -> tuple:
+        """
+        Returns the number of records and zones, None when the snapshot is not built.
+        """
+        with cls._lock:
+            return (len(cls._records), len(cls._indexes['zone'])) if cls._seq is not None else None
+
+    @classmethod
+    def zones(cls, dbconn) -> tuple:
+        """
+        Returns the number of records of each zone.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session, used to build the snapshot.
+
+        Returns:
+            tuple: The journal sequence number of the snapshot and the zone record counts.
+        """
+        with cls._lock:
+            cls._sync(dbconn)
+
+            return cls._seq, {zone: len(keys) for zone, keys in cls._indexes['zone'].items()}
+
+    @classmethod
+    def patch(cls, dbconn, seq: int, count: int, upserts: list = (), deletes: list = ()):
+        """
+        Applies a committed write to the snapshot. Upserted records are read back
+        from the datastore to catch their stored values.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            seq (int): The journal sequence number of the write's last entry.
+            count (int): The number of journal entries of the write.
+            upserts (list): The (rname, rtype, rdata) keys of inserted or updated records.
+            deletes (list): The (rname, rtype, rdata) keys of deleted records.
+        """
+        with cls._lock:
+            if cls._seq is None:
+                return
+
+            # Writes which were not applied in journal order are caught up from the journal
+            # when other processes write, otherwise the snapshot is invalidated
+            if seq - count != cls._seq:
+                if cls.shared():
+                    cls._catchup(dbconn)
+                    return
+
+                logger.debug(f'Invalidating record snapshot at {cls._seq} on write up to {seq}.')
+                cls._invalidate()
+                return
+
+            cls._apply(dbconn, seq, upserts, deletes)
+
+    @classmethod
+    def shared(cls) -> bool:
+        """
+        Whether the datastore is written by other processes, i.e. API workers.
+        """
+        return Config.int('cluster-master.workers', 0) > 1
+
+    @classmethod
+    def _invalidate(cls):
+        """
+        Drops the snapshot, rebuilt by the next read.
+        """
+        Metrics.inc('snapshot_invalidations_total')
+        cls._seq = None
+
+    @classmethod
+    def _apply(cls, dbconn, seq: int, upserts, deletes):
+        """
+        Applies record changes up to a journal sequence number, reading back upserted records.
+        """
+        try:
+            rows = dbconn.query(*[getattr(Record, f) for f in cls.FIELDS]).filter(
+                Record.rname.in_(list({k[0] for k in upserts}))).all() if upserts else []
+
+        except SQLAlchemyError:
+            logger.exception('Invalidating record snapshot on read back failure')
+            cls._invalidate()
+            return
+
+        for key in deletes:
+            cls._remove(key)
+
+        keys = set(upserts)
+        for row in rows:
+            if (row.rname, row.rtype, row.rdata) in keys:
+                cls._add(dict(zip(cls.FIELDS, row)))
+
+        cls._seq, cls._listing, cls._order, cls._pages, cls._paged = seq, None, None, {}, 0
+
+    @classmethod
+    def _catchup(cls, dbconn):
+        """
+        Applies the journal entries written since the snapshot's sequence number,
+        e.g. by other processes. The snapshot is invalidated when they were pruned.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+        """
+        try:
+            head = Change.head(dbconn)
+            if head == cls._seq:
+                return
+
+            if Change.tail(dbconn) > cls._seq + 1:
+                logger.debug(f'Invalidating record snapshot at {cls._seq} behind the retained journal.')
+                cls._invalidate()
+                return
+
+            changes = dbconn.query(Change.action, Change.rname, Change.rtype, Change.rdata) \
+                .filter(Change.seq > cls._seq, Change.seq <= head).order_by(Change.seq).all()
+
+        except SQLAlchemyError:
+            logger.exception('Invalidating record snapshot on journal read failure')
+            cls._invalidate()
+            return
+
+        # Keep the outcome of each record's last change
+        upserts, deletes = set(), set()
+        for change in changes:
+            key = (change.rname, change.rtype, change.rdata)
+            (deletes if change.action == Change.DELETE else upserts).add(key)
+            (upserts if change.action == Change.DELETE else deletes).discard(key)
+
+        cls._apply(dbconn, head, upserts, deletes)
@@ -1,19 +1,30 @@
 # Batteries
 import contextlib
+import signal
 import threading
+import time
 
 # Third-party imports
 import bjoern
 import falcon
+import falcon.asgi
 from loguru import logger
 import sqlalchemy
+import sqlalchemy.ext.asyncio
 import sqlalchemy.orm
 import sqlalchemy.exc
 
 # Local Imports
-from models import Base
+from config import Config, InvalidConfiguration
+from models import Base, migrate, tune, savepoints
+from utils.process import UnixProcess
 from .controllers import BASE_ENDPOINT, ROUTES
-from .middleware import LoggingMiddleware, SQLAlchemyMiddleware
+from .accesslog import AccessLog
+from .coordinator import WriteCoordinator
+from .metrics import Metrics
+from .middleware import LoggingMiddleware, MetricsMiddleware, CompressionMiddleware, SQLAlchemyMiddleware
+from .middleware import AsyncSQLAlchemyMiddleware
+from . import asgi, media, server
 
 
 def default_exception_handler(req: falcon.Request, resp: falcon.Response, ex: Exception, params: dict):
@@ -34,64 +45,296 @@ class ClusterMaster(threading.Thread):
         threading.Thread (class): The Thread class.
     """
 
-    def __init__(self, datastore='sqlite:///unbound-cluster.sqlite', bind='127.0.0.1', port=8000):
+    def __init__(self, datastore='sqlite:///unbound-cluster.sqlite', bind='127.0.0.1', port=8000, server='threaded',
+                 workers=0, **options):
         """
         Create an instance of the REST API interface.
 
         Args:
             bind (str, optional): The bind address for the API process. Defaults to '127.0.0.1'.
             port (int, optional): The port to which to bind. Defaults to 8000.
+            server (str, optional): The server, either 'bjoern' or 'threaded' for WSGI, or 'uvicorn' for
+                ASGI. The bjoern server does not hold watch requests open, so slaves then poll for changes
+                every update-interval rather than having them pushed. Defaults to 'threaded'.
+            workers (int, optional): The number of pre-forked API worker processes sharing the port.
+                The API is served from this thread when lower than 2. Defaults to 0.
+            options (dict): Remaining cluster-master options, read by the API components through Config.
         """
         super().__init__(name='cluster-master')
         self._datastore = datastore
         self._bind = bind
         self._port = port
+        self._server = server
+        self._workers = workers
+        self._stopping = False
 
-    @logger.catch
-    def run(self):
-        """
-        This will run in a separate thread.
+    def _setup(self, engine: sqlalchemy.engine.Engine):
         """
-        # MySQL Connection Configuration
-        engine = sqlalchemy.create_engine(self._datastore)
-        session_factory = sqlalchemy.orm.sessionmaker(bind=engine)
-        session = sqlalchemy.orm.scoped_session(session_factory)
+        Creates and migrates the datastore tables, exiting on failure.
 
+        Args:
+            engine (sqlalchemy.engine.Engine): The datastore engine.
+        """
         # MySQL Table Models Configuration
         try:
             Base.metadata.create_all(engine)
+            migrate(engine)
 
         except sqlalchemy.exc.OperationalError as e:
             code, message = e.orig.args
             logger.error(f'Operational Error\nCode: {code}\nMessage: {message}')
             exit(1)
 
+    def _engines(self) -> tuple:
+        """
+        Creates the datastore engines, applying the configured SQLite pragmas and timing their SQL statements.
+
+        When cluster-master.read-pool-size is set, safe requests read through a separate
+        read-only pool of that size and, with SQLite, writes are serialised through a
+        single connection rather than contending for the database lock.
+
+        Returns:
+            tuple: The engine and the read-only engine, None when reads are not split.
+        """
+        readers = Config.int('cluster-master.read-pool-size', 0)
+        url = sqlalchemy.make_url(self._datastore)
+        sqlite = url.get_backend_name() == 'sqlite'
+
+        # In-memory SQLite databases are private to their connection
+        if sqlite and url.database in (None, '', ':memory:'):
+            readers = 0
+
+        engine = sqlalchemy.create_engine(url, **({'pool_size': 1, 'max_overflow': 0} if sqlite and readers else {}))
+        tune(engine, Config.get('cluster-master.sqlite-pragmas'))
+        Metrics.instrument(engine)
+
+        # Mutations read and write in one transaction, group commits rolling back failed ones to their SAVEPOINT
+        savepoints(engine)
+
+        if not readers:
+            return engine, None
+
+        readengine = sqlalchemy.create_engine(url, pool_size=readers, max_overflow=0)
+        tune(readengine, Config.get('cluster-master.sqlite-pragmas'), readonly=True)
+        Metrics.instrument(readengine, 'read')
+
+        return engine, readengine
+
+    def _asyncdatastore(self) -> sqlalchemy.engine.URL:
+        """
+        Returns the datastore URL with an asyncio driver, used by the ASGI application: the
+        cluster-master.async-datastore URL, or the datastore with the aiosqlite driver for SQLite datastores.
+
+        Raises:
+            InvalidConfiguration: When no asyncio datastore URL is given for another database.
+        """
+        if Config.get('cluster-master.async-datastore'):
+            return sqlalchemy.make_url(Config.get('cluster-master.async-datastore'))
+
+        url = sqlalchemy.make_url(self._datastore)
+        if url.get_backend_name() != 'sqlite':
+            raise InvalidConfiguration(
+                f'The uvicorn server requires cluster-master.async-datastore, the datastore URL with an asyncio '
+                f'driver (e.g. mysql+aiomysql://...), for {url.get_backend_name()} datastores.')
+
+        return url.set(drivername='sqlite+aiosqlite')
+
+    def serve(self, reuse_port: bool = False):
+        """
+        Serves the API until the WSGI server stops.
+
+        Args:
+            reuse_port (bool, optional): Whether the port is shared with other API workers, in which
+                case the datastore tables are expected to be set up already. Defaults to False.
+        """
+        # Check the asyncio datastore of the ASGI application before starting anything
+        async_datastore = self._asyncdatastore() if self._server == 'uvicorn' else None
+
+        # MySQL Connection Configuration, with a separate read-only pool when configured
+        engine, readengine = self._engines()
+        session_factory = sqlalchemy.orm.sessionmaker(bind=engine)
+        session = sqlalchemy.orm.scoped_session(session_factory)
+        read_session_factory = sqlalchemy.orm.sessionmaker(bind=readengine) if readengine else None
+
+        if not reuse_port:
+            self._setup(engine)
+
+        # Write requests to the access log, when configured
+        accesslog = AccessLog(
+            Config.getpath('cluster-master.access-log.file'), Config.int('cluster-master.access-log.queue-size', 10000),
+            Config.int('cluster-master.access-log.batch-size', 1000)) \
+            if Config.get('cluster-master.access-log.file') else None
+
+        if accesslog:
+            accesslog.start()
+
+        # Commit the record mutations of concurrent requests together, when configured
+        if Config.get('cluster-master.group-commit'):
+            WriteCoordinator.start(
+                session_factory, Config.float('cluster-master.group-commit.interval', 0.002),
+                Config.int('cluster-master.group-commit.batch-size', 100),
+                Config.float('cluster-master.group-commit.timeout', 30))
+
+        middleware = [
+            LoggingMiddleware(Config.get('cluster-master.access-log.sampling'), accesslog),
+            MetricsMiddleware(),
+            CompressionMiddleware(
+                Config.int('cluster-master.compression-level', 6),
+                Config.int('cluster-master.compression-threshold', 1024)),
+        ]
+
+        # Create ASGI Application, with asyncio sessions besides the controllers' thread sessions
+        if self._server == 'uvicorn':
+            async_engine = sqlalchemy.ext.asyncio.create_async_engine(async_datastore)
+            tune(async_engine.sync_engine, Config.get('cluster-master.sqlite-pragmas'))
+
+            api = falcon.asgi.App(
+                middleware=middleware + [AsyncSQLAlchemyMiddleware(
+                    session_factory, sqlalchemy.ext.asyncio.async_sessionmaker(async_engine), read_session_factory)],
+                request_type=asgi.Request)
+
         # Create WSGI Application
-        api = falcon.App(
-            middleware=[
-                LoggingMiddleware(),
-                SQLAlchemyMiddleware(session)
-            ]
-        )
+        else:
+            async_engine = None
+            api = falcon.App(middleware=middleware + [SQLAlchemyMiddleware(
+                session, sqlalchemy.orm.scoped_session(read_session_factory) if readengine else None)])
 
         # Strip URL trailing slashes
         api.req_options.strip_url_path_trailing_slash = True
 
+        # Serialise request and response media with the fastest available JSON library
+        api.req_options.media_handlers[falcon.MEDIA_JSON] = media.handler()
+        api.resp_options.media_handlers[falcon.MEDIA_JSON] = media.handler()
+
         # Add exception handlers
-        api.add_error_handler(Exception, default_exception_handler)
+        api.add_error_handler(Exception, asgi.default_exception_handler_async if async_engine else
+                              default_exception_handler)
 
         # Route Loading
         for route in ROUTES:
-            api.add_route(f'{BASE_ENDPOINT}{route}', ROUTES[route]())
+            api.add_route(f'{BASE_ENDPOINT}{route}',
+                          asgi.AsyncResource(ROUTES[route]()) if async_engine else ROUTES[route]())
 
-        # Start WSGI server
-        logger.info(f'Starting bjoern server on {self._bind}:{self._port}')
+        # Start server
+        logger.info(f'Starting {self._server} server on {self._bind}:{self._port}')
+
+        if self._server == 'bjoern':
+            logger.warning('The bjoern server answers watch requests right away, so slaves poll for changes every '
+                           'update-interval. Use the threaded or uvicorn server to push changes to slaves.')
 
         try:
-            bjoern.run(api, self._bind, self._port)
+            if self._server == 'threaded':
+                server.threaded(api, self._bind, self._port, reuse_port)
+            elif self._server == 'uvicorn':
+                asgi.run(api, self._bind, self._port, reuse_port, async_engine)
+            else:
+                bjoern.run(api, self._bind, self._port, reuse_port=reuse_port)
         except Exception as e:
-            logger.info(f'Shutting down bjoern due to: {str(e)}')
+            logger.info(f'Shutting down {self._server} server due to: {str(e)}')
+
+        # Commit pending record mutations
+        if WriteCoordinator.enabled():
+            WriteCoordinator.stop()
 
-        # Dispose engine before thread shutdown
+        # Write pending access log entries
+        if accesslog:
+            accesslog.stop()
+
+        # Dispose engines before thread shutdown
         with contextlib.suppress(sqlalchemy.exc.DatabaseError):
             engine.dispose()
+
+            if readengine:
+                readengine.dispose()
+
+    def _supervise(self):
+        """
+        Runs the API worker processes, restarting those which die, until stopped.
+        """
+        # Check the asyncio datastore once, rather than in each restarted worker
+        if self._server == 'uvicorn':
+            self._asyncdatastore()
+
+        # Set up the tables once, before the workers open their own engines
+        engine = sqlalchemy.create_engine(self._datastore)
+        tune(engine, Config.get('cluster-master.sqlite-pragmas'))
+        self._setup(engine)
+        engine.dispose()
+
+        workers = [None] * self._workers
+
+        while self._stopping is False:
+            for index, worker in enumerate(workers):
+                if worker and worker.is_alive():
+                    continue
+
+                if worker:
+                    logger.warning(f'API worker {index} exited with code {worker.exitcode}, restarting it.')
+
+                workers[index] = ApiWorker(self, index)
+                workers[index].start()
+
+            time.sleep(1)
+
+        logger.info(f'Stopping {self._workers} API workers')
+
+        for worker in workers:
+            worker.terminate()
+
+        for worker in workers:
+            worker.join()
+
+    def stopthread(self):
+        """
+        Stops the API workers, when serving from worker processes.
+        """
+        self._stopping = True
+
+    @logger.catch
+    def run(self):
+        """
+        This will run in a separate thread.
+        """
+        if self._workers > 1:
+            self._supervise()
+        else:
+            self.serve()
+
+
+class ApiWorker(UnixProcess):
+    """
+    A pre-forked API worker process, serving the API on the port shared with the other workers.
+
+    Args:
+        utils.process.UnixProcess (class): UnixProcess class.
+    """
+
+    def __init__(self, master: ClusterMaster, index: int):
+        """
+        Create an API worker process.
+
+        Args:
+            master (ClusterMaster): The REST API interface, served by the worker.
+            index (int): The worker number.
+        """
+        super().__init__(f'api worker {index}')
+        self._master = master
+        self._index = index
+        self.daemon = True
+
+    @logger.catch
+    def run(self):
+        """
+        This will run in a separate process.
+        """
+        # Set process title
+        self.setprocname()
+
+        # Terminate on signals rather than the handlers inherited from the master process
+        self.sigreg(signal.SIGINT, signal.SIG_DFL)
+        self.sigreg(signal.SIGTERM, signal.SIG_DFL)
+
+        # Tell this worker's metrics from the other workers'
+        Metrics.label(worker=self._index)
+
+        self._master.serve(reuse_port=True)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Load tests the REST API. A cluster master is started on a local port with a
+temporary SQLite datastore, seeded with records, and driven by concurrent
+clients issuing a weighted mix of requests. Throughput and latency
+percentiles are reported per endpoint as JSON. No network access is needed.
+
+Usage:
+    python benchmarks/api.py [--records 10000] [--concurrency 8] [--duration 10]
+                             [--mix get=60,list=5,post=15,put=10,delete=10]
+                             [--server bjoern|threaded|uvicorn] [--output results.json]
+"""
+# Batteries
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Third-party Imports
+import requests
+
+# Local Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmarks.cluster import freeport, serve  # noqa: E402
+from config import Config  # noqa: E402
+
+# Requests of each operation
+OPERATIONS = {
+    'get': 'GET /api/record/A/{rname}',
+    'list': 'GET /api/record',
+    'post': 'POST /api/record/A',
+    'put': 'PUT /api/record/A/{rname}',
+    'delete': 'DELETE /api/record/A/{rname}',
+}
+
+
+def waitready(session: requests.Session, location: str, timeout: float = 30):
+    """
+    Waits for the master to answer requests.
+    """
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        try:
+            if session.get(f'{location}/zone', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            time.sleep(0.1)
+
+    raise RuntimeError(f'Master at {location} did not start within {timeout} seconds')
+
+
+def seed(session: requests.Session, location: str, count: int) -> list:
+    """
+    Creates the initial records through the bulk endpoint.
+
+    Returns:
+        list: The seeded record names.
+    """
+    names = [f'bench{i}.zone{i % 100}.example.com' for i in range(count)]
+
+    for start in range(0, count, 1000):
+        resp = session.post(f'{location}/records/bulk', json=[
+            {'rname': name, 'rtype': 'A', 'rdata': f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'}
+            for i, name in enumerate(names[start:start + 1000], start)])
+        resp.raise_for_status()
+
+    return names
+
+
+class Worker(threading.Thread):
+    """
+    A client issuing a weighted random mix of requests until the deadline.
+    """
+
+    def __init__(self, index: int, location: str, names: list, mix: dict, deadline: float):
+        """
+        Create a worker.
+
+        Args:
+            index (int): The worker number, which seeds its random choices.
+            location (str): The master API location.
+            names (list): The seeded record names.
+            mix (dict): The operation weights.
+            deadline (float): The unix timestamp to stop at.
+        """
+        super().__init__(name=f'worker-{index}', daemon=True)
+        self._index = index
+        self._location = location
+        self._names = names
+        self._mix = mix
+        self._deadline = deadline
+        self._random = random.Random(index)
+        self._created = []
+        self.samples = {op: [] for op in OPERATIONS}
+        self.errors = {op: 0 for op in OPERATIONS}
+
+    def _request(self, session: requests.Session, op: str, count: int) -> requests.Response:
+        """
+        Issues one request of an operation, deletes taking the last created record.
+        """
+        name = self._random.choice(self._names)
+        rdata = f'192.0.2.{self._random.randint(1, 254)}'
+
+        if op == 'get':
+            return session.get(f'{self._location}/record/A/{name}')
+
+        if op == 'list':
+            return session.get(f'{self._location}/record')
+
+        if op == 'put':
+            return session.put(f'{self._location}/record/A/{name}', json={'rdata': rdata})
+
+        if op == 'delete':
+            return session.delete(f'{self._location}/record/A/{self._created.pop()}')
+
+        # Create records to delete later
+        self._created.append(f'w{self._index}-{count}.new.example.com')
+        return session.post(f'{self._location}/record/A', json={'rname': self._created[-1], 'rdata': rdata})
+
+    def run(self):
+        """
+        Issues requests until the deadline, timing each one.
+        """
+        session = requests.Session()
+        session.trust_env = False
+        ops, weights, count = list(self._mix), list(self._mix.values()), 0
+
+        while time.time() < self._deadline:
+            op, count = self._random.choices(ops, weights)[0], count + 1
+
+            # Deletes without previously created records create one instead
+            if op == 'delete' and not self._created:
+                op = 'post'
+
+            start = time.perf_counter()
+            try:
+                ok = self._request(session, op, count).status_code < 400
+            except requests.RequestException:
+                ok = False
+
+            self.samples[op].append(time.perf_counter() - start)
+            self.errors[op] += not ok
+
+
+def percentile(samples: list, rank: float) -> float:
+    """
+    Returns the nearest-rank percentile of sorted samples.
+    """
+    return samples[min(len(samples) - 1, int(rank / 100 * len(samples)))] if samples else 0
+
+
+def summary(samples: list, errors: int, duration: float) -> dict:
+    """
+    Summarises an endpoint's latency samples, in milliseconds.
+    """
+    samples = sorted(samples)
+
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': round(len(samples) / duration, 1),
+        'latency_ms': {
+            'mean': round(sum(samples) / len(samples) * 1000, 3) if samples else 0,
+            'p50': round(percentile(samples, 50) * 1000, 3),
+            'p95': round(percentile(samples, 95) * 1000, 3),
+            'p99': round(percentile(samples, 99) * 1000, 3),
+            'max': round(samples[-1] * 1000, 3) if samples else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='REST API load benchmark')
+    parser.add_argument('--records', type=int, default=10000, help='Number of seeded records')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to drive load for')
+    parser.add_argument('--mix', default='get=60,list=5,post=15,put=10,delete=10',
+                        help=f'Comma separated operation weights, among {", ".join(OPERATIONS)}')
+    parser.add_argument('--server', default='bjoern', choices=('bjoern', 'threaded', 'uvicorn'), help='API server')
+    parser.add_argument('--output', help='Write results to this file instead of stdout')
+    args = parser.parse_args()
+
+    mix = {op: float(weight) for op, weight in (item.split('=') for item in args.mix.split(','))}
+    if set(mix) - set(OPERATIONS):
+        parser.error(f'Unknown operations: {", ".join(set(mix) - set(OPERATIONS))}')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        port = freeport()
+        location = f'http://127.0.0.1:{port}/api'
+        configfile = os.path.join(tmpdir, 'config.json')
+
+        # Run the master with the example configuration and a temporary datastore
+        with open(os.path.join(Config.BASE_DIR, 'config.example.json')) as f:
+            config = json.load(f)
+
+        config.pop('cluster-slave', None)
+        config['cluster-master'].update({
+            'datastore': f'sqlite:///{tmpdir}/bench.sqlite', 'bind': '127.0.0.1', 'port': port, 'server': args.server,
+            'access-log': {**config['cluster-master'].get('access-log', {}), 'file': f'{tmpdir}/access.log'}})
+
+        with open(configfile, 'w') as f:
+            json.dump(config, f)
+
+        master = multiprocessing.Process(target=serve, args=(configfile,), daemon=True)
+        master.start()
+
+        try:
+            session = requests.Session()
+            session.trust_env = False
+
+            waitready(session, location)
+
+            start = time.perf_counter()
+            names = seed(session, location, args.records)
+            seeding = time.perf_counter() - start
+
+            workers = [Worker(i, location, names, mix, time.time() + args.duration) for i in range(args.concurrency)]
+            start = time.perf_counter()
+
+            for worker in workers:
+                worker.start()
+
+            for worker in workers:
+                worker.join()
+
+            duration = time.perf_counter() - start
+
+        finally:
+            master.terminate()
+            master.join()
+
+    # Deletes fall back to posts, which are reported even when left out of the mix
+    measured = [op for op in OPERATIONS if op in mix or any(w.samples[op] for w in workers)]
+
+    results = {
+        'parameters': {**vars(args), 'mix': mix},
+        'seeding_seconds': round(seeding, 3),
+        'duration_seconds': round(duration, 3),
+        'endpoints': {
+            OPERATIONS[op]: summary(
+                [s for w in workers for s in w.samples[op]], sum(w.errors[op] for w in workers), duration)
+            for op in measured
+        },
+        'total': summary(
+            [s for w in workers for op in measured for s in w.samples[op]],
+            sum(e for w in workers for e in w.errors.values()), duration),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
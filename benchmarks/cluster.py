@@ -0,0 +1,42 @@
+"""
+Helpers shared by the benchmarks and the tests to run cluster components in
+their own processes, since the API components keep their state in static classes.
+"""
+# Batteries
+import os
+import socket
+import sys
+
+# Local Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from config import Config  # noqa: E402
+
+
+def quiet():
+    """
+    Limits logging of a benchmark process to warnings.
+    """
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+
+def serve(configfile: str):
+    """
+    Runs a cluster master until terminated, logging warnings only.
+    """
+    from api import ClusterMaster
+
+    quiet()
+    Config.load(configfile)
+    ClusterMaster(**Config.get('cluster-master')).run()
+
+
+def freeport() -> int:
+    """
+    Returns a free local TCP port.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
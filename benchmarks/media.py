@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measures the cost of serialising record listings with the stdlib json module,
+as falcon does by default, and with the API's media functions (orjson when
+installed), both as one document and per record as the record snapshot does.
+
+Usage:
+    python benchmarks/media.py [--sizes 10000,100000,1000000] [--repeat 3]
+"""
+# Batteries
+import argparse
+import json
+import os
+import sys
+import time
+
+# Local Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from api import media  # noqa: E402
+
+
+def records(count: int) -> list:
+    """
+    Builds a listing of A records shaped like the record controller's.
+    """
+    now = int(time.time())
+
+    return [{
+        'rname': f'host{i}.zone{i % 1000}.example.com',
+        'rtype': 'A',
+        'rdata': f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}',
+        'ttl': 300,
+        'zone': 'example.com',
+        'created': now,
+        'updated': now,
+    } for i in range(count)]
+
+
+def measure(function, repeat: int) -> tuple:
+    """
+    Returns the best duration in seconds of a function over several runs, along with its result size.
+    """
+    best, size = float('inf'), 0
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(function())
+        best = min(best, time.perf_counter() - start)
+
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record listing serialisation benchmark')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma separated listing sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the best one is kept')
+    args = parser.parse_args()
+
+    print(f'media library: {"orjson" if media.orjson else "json (stdlib)"}')
+    print(f'{"records":>10} {"method":<24} {"seconds":>9} {"records/s":>12} {"MiB":>8}')
+
+    for count in (int(s) for s in args.sizes.split(',')):
+        listing = {'seq': count, 'records': records(count)}
+
+        methods = {
+            'stdlib json.dumps': lambda: json.dumps(listing).encode(),
+            'media.dumps': lambda: media.dumps(listing),
+            'media.dumps per record': lambda: b','.join(media.dumps(r) for r in listing['records']),
+        }
+
+        for name, function in methods.items():
+            seconds, size = measure(function, args.repeat)
+            print(f'{count:>10} {name:<24} {seconds:>9.3f} {count / seconds:>12,.0f} {size / 2 ** 20:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Measures how long API writes take to go live on slaves. A cluster master and
+a fleet of slaves run on the local host, each slave pointed at a stub unbound
+process which writes its pidfile and, on every SIGHUP, records the time along
+with the record names found in the slave's local-data directory.
+
+For each fleet size and write rate, records are created at a steady rate and
+the convergence latency (time from the write request to the first reload
+exposing the record) is reported per write, as the slowest slave, and per
+slave, along with the number of reloads per write. No network access is needed.
+
+Usage:
+    python benchmarks/propagation.py [--slaves 1,4] [--rates 1,10] [--duration 10]
+                                     [--server threaded|bjoern|uvicorn] [--output results.json]
+"""
+# Batteries
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import tempfile
+import time
+
+# Third-party Imports
+import requests
+
+# Local Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmarks.cluster import freeport, quiet, serve  # noqa: E402
+from config import Config  # noqa: E402
+
+# Record names of local-data entries in zone files
+LOCAL_DATA = re.compile(r'^local-data: "(\S+) ', re.MULTILINE)
+
+
+def sync(configfile: str):
+    """
+    Runs a cluster slave until terminated.
+    """
+    from client import ClusterSlave
+
+    quiet()
+    Config.load(configfile)
+    ClusterSlave().run()
+
+
+def unbound(pidfile: str, datadir: str, eventsfile: str):
+    """
+    Stands in for unbound: writes the pidfile and logs the record names loaded on each SIGHUP.
+    """
+    def reload(signum, frame):
+        names = []
+
+        for path in glob.glob(f'{datadir}/*.conf'):
+            with open(path) as zonefile:
+                names.extend(LOCAL_DATA.findall(zonefile.read()))
+
+        with open(eventsfile, 'a') as events:
+            events.write(json.dumps({'time': time.time(), 'names': names}) + '\n')
+
+    signal.signal(signal.SIGHUP, reload)
+
+    with open(pidfile, 'w') as f:
+        f.write(str(os.getpid()))
+
+    while True:
+        signal.pause()
+
+
+def events(eventsfile: str) -> list:
+    """
+    Returns the reload events logged by a stub unbound, oldest first.
+    """
+    try:
+        with open(eventsfile) as f:
+            return [json.loads(line) for line in f if line.endswith('\n')]
+    except FileNotFoundError:
+        return []
+
+
+def golive(eventsfile: str) -> dict:
+    """
+    Returns the time each record name first went live on a slave.
+    """
+    live = {}
+
+    for event in events(eventsfile):
+        for name in event['names']:
+            live.setdefault(name, event['time'])
+
+    return live
+
+
+def distribution(samples: list) -> dict:
+    """
+    Summarises latency samples, in milliseconds.
+    """
+    samples = sorted(samples)
+
+    def rank(percent):
+        return round(samples[min(len(samples) - 1, int(percent / 100 * len(samples)))] * 1000, 3) if samples else None
+
+    return {
+        'mean': round(sum(samples) / len(samples) * 1000, 3) if samples else None,
+        'p50': rank(50),
+        'p95': rank(95),
+        'p99': rank(99),
+        'max': rank(100),
+    }
+
+
+def run(config: dict, slaves: int, rate: float, duration: float, settle: float) -> dict:
+    """
+    Runs one scenario on a fresh master and fleet.
+
+    Args:
+        config (dict): The base configuration.
+        slaves (int): The number of slaves.
+        rate (float): The writes per second.
+        duration (float): The seconds to write for.
+        settle (float): The seconds to wait for the fleet to converge after the last write.
+
+    Returns:
+        dict: The scenario results.
+    """
+    processes = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        port = freeport()
+        location = f'http://127.0.0.1:{port}/api'
+
+        def start(target, *args):
+            process = multiprocessing.Process(target=target, args=args, daemon=True)
+            process.start()
+            processes.append(process)
+
+        def configure(name, **sections):
+            path = os.path.join(tmpdir, f'{name}.json')
+            with open(path, 'w') as f:
+                json.dump({**{k: v for k, v in config.items() if not k.startswith('cluster-')}, **sections}, f)
+            return path
+
+        try:
+            start(serve, configure('master', **{'cluster-master': {
+                **config['cluster-master'], 'datastore': f'sqlite:///{tmpdir}/master.sqlite', 'port': port,
+                'access-log': {**config['cluster-master'].get('access-log', {}), 'file': f'{tmpdir}/access.log'}}}))
+
+            # Start each slave along with its stub unbound
+            eventsfiles = []
+            for i in range(slaves):
+                slavedir, pidfile = os.path.join(tmpdir, f'slave{i}'), os.path.join(tmpdir, f'unbound{i}.pid')
+                eventsfiles.append(os.path.join(tmpdir, f'unbound{i}.jsonl'))
+
+                start(unbound, pidfile, slavedir, eventsfiles[-1])
+                start(sync, configure(f'slave{i}', **{'cluster-slave': {
+                    **config['cluster-slave'], 'local-data-dir': slavedir, 'unbound-pid': pidfile,
+                    'unbound-control': None, 'master-location': location,
+                    'stats-file': os.path.join(tmpdir, f'slave{i}-stats.json'), 'status-port': None}}))
+
+            session = requests.Session()
+            session.trust_env = False
+
+            # Wait for the whole fleet to apply a first write
+            deadline = time.time() + 60
+            while True:
+                try:
+                    session.post(f'{location}/record/A', json={'rname': 'warmup.example.com', 'rdata': '192.0.2.1'})
+                    if all('warmup.example.com' in golive(f) for f in eventsfiles):
+                        break
+                except requests.RequestException:
+                    pass
+
+                if time.time() > deadline:
+                    raise RuntimeError('Fleet did not converge on the warmup write within 60 seconds')
+
+                time.sleep(0.2)
+
+            reloads = [len(events(f)) for f in eventsfiles]
+
+            # Write records at a steady rate
+            writes, start_time = {}, time.time()
+            for i in range(int(rate * duration)):
+                time.sleep(max(0., start_time + i / rate - time.time()))
+
+                name = f'p{i}.example.com'
+                writes[name] = time.time()
+                session.post(f'{location}/record/A', json={'rname': name, 'rdata': f'10.0.{i >> 8 & 255}.{i & 255}'})
+
+            elapsed = time.time() - start_time
+
+            # Wait for the fleet to converge
+            deadline = time.time() + settle
+            while time.time() < deadline:
+                live = [golive(f) for f in eventsfiles]
+                if all(name in slive for slive in live for name in writes):
+                    break
+                time.sleep(0.2)
+
+            live = [golive(f) for f in eventsfiles]
+            reloads = [len(events(f)) - r for f, r in zip(eventsfiles, reloads)]
+
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+
+    converged = [name for name in writes if all(name in slive for slive in live)]
+
+    return {
+        'slaves': slaves,
+        'rate': rate,
+        'writes': len(writes),
+        'achieved_rate': round(len(writes) / elapsed, 2) if elapsed else None,
+        'converged': len(converged),
+        'fleet_latency_ms': distribution([max(slive[n] for slive in live) - writes[n] for n in converged]),
+        'slave_latency_ms': distribution([slive[n] - t for slive in live for n, t in writes.items() if n in slive]),
+        'reloads_per_write': round(sum(reloads) / slaves / len(writes), 3) if writes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write propagation benchmark')
+    parser.add_argument('--slaves', default='1,4', help='Comma separated fleet sizes')
+    parser.add_argument('--rates', default='1,10', help='Comma separated writes per second')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to write for in each scenario')
+    parser.add_argument('--settle', type=float, default=30, help='Seconds to wait for convergence after writing')
+    parser.add_argument('--server', default='threaded', choices=('bjoern', 'threaded', 'uvicorn'),
+                        help='Master API server')
+    parser.add_argument('--output', help='Write results to this file instead of stdout')
+    args = parser.parse_args()
+
+    # Run the processes with the example configuration
+    with open(os.path.join(Config.BASE_DIR, 'config.example.json')) as f:
+        config = json.load(f)
+
+    config['cluster-master'].update({'bind': '127.0.0.1', 'server': args.server})
+
+    results = {
+        'parameters': vars(args),
+        'scenarios': [
+            run(config, int(slaves), float(rate), args.duration, args.settle)
+            for slaves in args.slaves.split(',') for rate in args.rates.split(',')
+        ],
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
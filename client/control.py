@@ -0,0 +1,52 @@
+# Batteries
+import shlex
+import subprocess
+
+# Third-party imports
+from loguru import logger
+
+
+class UnboundControl(object):
+    """
+    Runs unbound-control commands against the local unbound instance.
+    """
+
+    def __init__(self, command, timeout: float = 10):
+        """
+        Create an unbound-control runner.
+
+        Args:
+            command (str|list): The unbound-control executable, optionally with its
+                arguments (e.g. '-c /etc/unbound/unbound.conf').
+            timeout (float, optional): Seconds to wait for each command. Defaults to 10.
+        """
+        self._command = shlex.split(command) if isinstance(command, str) else list(command)
+        self._timeout = timeout
+
+    def run(self, command: str, lines: list = ()) -> bool:
+        """
+        Runs an unbound-control command, feeding lines through stdin to bulk commands.
+
+        Args:
+            command (str): The unbound-control command (e.g. 'local_datas').
+            lines (list, optional): The lines to write to stdin.
+
+        Returns:
+            bool: Success of the operation.
+        """
+        try:
+            proc = subprocess.run(
+                self._command + [command], input=''.join(f'{line}\n' for line in lines), capture_output=True,
+                text=True, timeout=self._timeout)
+
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f'Could not run unbound-control {command}: {str(e)}')
+            return False
+
+        # unbound-control exits successfully even when some bulk lines fail
+        if proc.returncode != 0 or 'error' in proc.stdout:
+            logger.warning(f'unbound-control {command} failed with code {proc.returncode}: '
+                           f'{(proc.stdout + proc.stderr).strip()}')
+            return False
+
+        return True
@@ -0,0 +1,152 @@
+# Batteries
+import collections
+import contextlib
+import http.server
+import json
+import os
+import threading
+import time
+
+# Third-party imports
+from loguru import logger
+
+
+class SyncStats(object):
+    """
+    Records the slave's sync cycle telemetry: the time spent in each phase,
+    record and zone counts, bytes transferred, reloads and the lag behind the
+    master. The most recent cycles are kept along with running totals, and
+    can be written to a stats file and served over a local HTTP endpoint.
+    """
+
+    def __init__(self, path: str = None, history: int = 100):
+        """
+        Create an empty sync cycle recorder.
+
+        Args:
+            path (str, optional): The stats file, rewritten after each cycle. Disabled when None.
+            history (int, optional): The number of recent cycles to keep. Defaults to 100.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._cycles = collections.deque(maxlen=history)
+        self._totals = collections.Counter()
+        self._state = {}
+        self._cycle = None
+
+    def begin(self):
+        """
+        Starts recording a sync cycle.
+        """
+        self._cycle = {'time': time.time(), 'phases': collections.Counter(), 'counts': collections.Counter()}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Times a phase of the current cycle, adding up repeated phases.
+
+        Args:
+            name (str): The phase name (e.g. 'fetch', 'decode', 'flush').
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            if self._cycle is not None:
+                self._cycle['phases'][name] += time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1):
+        """
+        Adds to a counter of the current cycle.
+
+        Args:
+            name (str): The counter name (e.g. 'bytes', 'reloads').
+            value (int, optional): The increment. Defaults to 1.
+        """
+        if self._cycle is not None:
+            self._cycle['counts'][name] += value
+
+    def end(self, **state):
+        """
+        Ends the current cycle and writes the stats file.
+
+        Args:
+            state (dict): The slave's state after the cycle (e.g. record count, lag).
+        """
+        cycle, self._cycle = self._cycle, None
+
+        if cycle is None:
+            return
+
+        cycle['duration'] = time.time() - cycle['time']
+        cycle['phases'] = {k: round(v, 6) for k, v in cycle['phases'].items()}
+
+        with self._lock:
+            self._cycles.append({**cycle, 'counts': dict(cycle['counts'])})
+            self._totals.update(cycle['counts'])
+            self._totals['cycles'] += 1
+            self._state = state
+
+        if self._path:
+            self._write()
+
+    def status(self) -> dict:
+        """
+        Returns the current state, running totals and recent cycles.
+        """
+        with self._lock:
+            return {
+                'uptime': round(time.time() - self._started, 3),
+                'state': dict(self._state),
+                'totals': dict(self._totals),
+                'cycles': list(self._cycles),
+            }
+
+    def _write(self):
+        """
+        Replaces the stats file with the current status.
+        """
+        try:
+            with open(f'{self._path}.tmp', 'w') as statsfile:
+                json.dump(self.status(), statsfile)
+
+            os.replace(f'{self._path}.tmp', self._path)
+
+        except OSError as e:
+            logger.warning(f'Could not write stats file {self._path}: {str(e)}')
+
+    def serve(self, bind: str, port: int) -> http.server.HTTPServer:
+        """
+        Serves the status as JSON over HTTP from a daemon thread.
+
+        Args:
+            bind (str): The bind address, which should be local.
+            port (int): The port to which to bind.
+
+        Returns:
+            http.server.HTTPServer: The running server.
+        """
+        stats = self
+
+        class StatusHandler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = json.dumps(stats.status()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((bind, port), StatusHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='slave-status', daemon=True).start()
+
+        logger.info(f'Serving slave status on {bind}:{port}')
+
+        return server
@@ -1,18 +1,26 @@
 # Batteries
-import itertools
+import concurrent.futures
+import hashlib
+import ipaddress
 import os
 import glob
 import time
 import signal
 import threading
+import urllib.parse
 
 # Third-party imports
 import requests
-import tldextract
 from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 # Local Imports
 from config import Config
+from utils.zone import ZoneResolver
+from .control import UnboundControl
+from .stats import SyncStats
+from .zones import ZoneIndex
 
 
 class ClusterSlave(threading.Thread):
@@ -23,12 +31,19 @@ class ClusterSlave(threading.Thread):
         threading.Thread (class): The Thread class.
     """
     # Slave headers
-    _slave_headers = {'User-Agent': 'unbound-cluster-slave'}
+    _slave_headers = {'User-Agent': 'unbound-cluster-slave', 'Accept-Encoding': 'gzip'}
+
+    # Master responses retried on GET requests
+    RETRY_STATUSES = (502, 503, 504)
 
     # Zone record entries format for unbound
     UNBOUND_DEF_FORMAT = 'local-data: "{rname} {ttl} {rtype} {rdata}"'
     UNBOUND_PTR_FORMAT = 'local-data-ptr: "{rdata} {ttl} {rname}"'
 
+    # Record entries format for unbound-control
+    CONTROL_DEF_FORMAT = '{rname} {ttl} {rtype} {rdata}'
+    CONTROL_PTR_FORMAT = '{ptr} {ttl} PTR {rname}'
+
     def __init__(self):
         """
         Create an instance of the unbound cluster sync client.
@@ -38,20 +53,55 @@ class ClusterSlave(threading.Thread):
         self._unbound_pidfile = Config.getpath('cluster-slave.unbound-pid')
         self._master_location = Config.get('cluster-slave.master-location')
         self._update_interval = Config.int('cluster-slave.update-interval', 5)
+        self._watch_timeout = Config.int('cluster-slave.watch-timeout', 30)
+        self._page_size = Config.int('cluster-slave.page-size', 10000)
+        self._fsync = Config.get('cluster-slave.fsync', True)
+        self._flusher = concurrent.futures.ThreadPoolExecutor(
+            Config.int('cluster-slave.flush-threads', 1), thread_name_prefix='zone-flush') \
+            if Config.int('cluster-slave.flush-threads', 1) > 1 else None
+        self._control = UnboundControl(Config.get('cluster-slave.unbound-control')) \
+            if Config.get('cluster-slave.unbound-control') else None
         self._stop = False
         self._last_update = 0
+        self._index = ZoneIndex(self.rzone)
+        self._hashes = {}
+        self._seq = None
+        self._resynced = False
+        self._etag = (None, None)
+        self._master_seq = None
+        self._last_created = None
+        self._stats = SyncStats(
+            Config.getpath('cluster-slave.stats-file') if Config.get('cluster-slave.stats-file') else None)
+        self._session = self._httpsession()
+        self._timeout = (
+            Config.float('cluster-slave.connect-timeout', 5),
+            Config.float('cluster-slave.read-timeout', 30) + self._watch_timeout)
+
+    def _httpsession(self) -> requests.Session:
+        """
+        Creates the HTTP session to the master, which keeps its connection alive
+        between polls and retries failed connections and gateway errors.
 
-    def _flushzone(self, zone, records):
+        Returns:
+            requests.Session: The HTTP session.
         """
-        Flushes zone records to a zone file.
+        retries = Retry(
+            total=Config.int('cluster-slave.retries', 3), backoff_factor=0.5, status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=('GET',), raise_on_status=False)
 
-        :param zone: The zone to write.
-        :param records: The records to flush to the zone.
+        session = requests.Session()
+        session.headers.update(self._slave_headers)
+        session.mount(self._master_location, HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retries))
+
+        return session
+
+    def _renderzone(self, zone, records) -> str:
         """
-        # Check if zones directory exists
-        if not os.path.isdir(self._localdata_dir):
-            os.makedirs(self._localdata_dir)
+        Renders zone records into the zone file contents.
 
+        :param zone: The zone to render.
+        :param records: The records of the zone.
+        """
         recordlist = []
 
         for record in records:
@@ -63,10 +113,65 @@ class ClusterSlave(threading.Thread):
             # Append record to list
             recordlist.append(f'{self.UNBOUND_DEF_FORMAT.format(**record)}\n')
 
-        # Flush changes to file
-        with open(f'{self._localdata_dir}/{zone}.conf', 'w+') as zonefile:
-            zonefile.write(f'server:\n\nlocal-zone: "{zone}" transparent\n\n')
-            zonefile.writelines(recordlist)
+        return f'server:\n\nlocal-zone: "{zone}" transparent\n\n' + ''.join(recordlist)
+
+    def _flushzone(self, zone, records) -> bool:
+        """
+        Flushes zone records to a zone file, unless its contents are unchanged.
+
+        The file is written under a temporary name and renamed over the zone file,
+        so unbound never reads a partially written zone. Its data is synced to disk
+        first when fsync is enabled, the directory being synced by _flushzones.
+
+        :param zone: The zone to write.
+        :param records: The records to flush to the zone.
+        :return: Whether the zone file was written.
+        """
+        content = self._renderzone(zone, records)
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        path = f'{self._localdata_dir}/{zone}.conf'
+
+        # Learn the digest of a zone file left by a previous run
+        if zone not in self._hashes and os.path.isfile(path):
+            with open(path, 'rb') as zonefile:
+                self._hashes[zone] = hashlib.sha1(zonefile.read()).hexdigest()
+
+        # Skip unchanged zones
+        if self._hashes.get(zone) == digest:
+            return False
+
+        # Check if zones directory exists
+        os.makedirs(self._localdata_dir, exist_ok=True)
+
+        # Flush changes to a temporary file, then replace the zone file with it
+        with open(f'{path}.tmp', 'w') as zonefile:
+            zonefile.write(content)
+
+            if self._fsync:
+                zonefile.flush()
+                os.fdatasync(zonefile.fileno())
+
+        os.replace(f'{path}.tmp', path)
+
+        self._hashes[zone] = digest
+
+        return True
+
+    def _removezone(self, zone) -> bool:
+        """
+        Removes a zone file.
+
+        :param zone: The zone to remove.
+        :return: Whether the zone file existed.
+        """
+        self._hashes.pop(zone, None)
+
+        try:
+            os.unlink(f'{self._localdata_dir}/{zone}.conf')
+        except FileNotFoundError:
+            return False
+
+        return True
 
     def _unboundreload(self):
         """
@@ -98,11 +203,287 @@ class ClusterSlave(threading.Thread):
 
         return True
 
+    def _rrs(self, record: dict) -> list:
+        """
+        Returns the unbound-control resource records of a record, including
+        the PTR record of A records, as (owner name, record entry) pairs.
+        """
+        rrs = [(record['rname'], self.CONTROL_DEF_FORMAT.format(**record))]
+
+        # If A record then also append PTR record
+        if record['rtype'] == 'A':
+            ptr = ipaddress.ip_address(record['rdata']).reverse_pointer
+            rrs.append((ptr, self.CONTROL_PTR_FORMAT.format(ptr=ptr, **record)))
+
+        return rrs
+
+    def _unboundapply(self, changes: dict) -> bool:
+        """
+        Applies changed records to the running unbound instance through unbound-control,
+        without reloading its configuration nor flushing its cache. Every owner name
+        touched by a change is removed and its current records added back, those of
+        PTR owners from every zone since A records of different zones share addresses.
+
+        Args:
+            changes (dict): The changed zones, as returned by _flushzones.
+
+        Returns:
+            bool: Success of the operation. Fails when unbound-control is not configured,
+                whole zones were replaced or any command failed.
+        """
+        if not self._control or None in changes.values():
+            return False
+
+        zones, removed, owners, addresses, datas = [], [], set(), set(), []
+
+        for zone, touched in changes.items():
+            records = self._index.records(zone)
+            (zones if records else removed).append(zone)
+
+            # Collect owner names of changed records and their current entries, except PTR entries
+            names = {owner for r in touched for owner, _ in self._rrs(r)}
+            owners.update(names)
+            addresses.update(r['rdata'] for r in touched if r['rtype'] == 'A')
+            datas.extend(rr for r in records for owner, rr in self._rrs(r) if owner == r['rname'] and owner in names)
+
+        # Add back the PTR entries of changed addresses, from every zone
+        datas.extend(rr for address in sorted(addresses) for r in self._index.addressed(address)
+                     for owner, rr in self._rrs(r) if owner != r['rname'])
+
+        logger.info(f'Applying {len(datas)} records of zones {list(changes)} through unbound-control...')
+
+        return (not zones or self._control.run('local_zones', [f'{zone} transparent' for zone in zones])) \
+            and self._control.run('local_datas_remove', sorted(owners)) \
+            and (not datas or self._control.run('local_datas', datas)) \
+            and (not removed or self._control.run('local_zones_remove', removed))
+
+    def _fetch(self, path: str) -> requests.Response:
+        """
+        Performs a GET request to the master API. When repeating the previous
+        request, its ETag is sent so the master answers 304 if nothing changed.
+
+        Args:
+            path (str): The API path, relative to the master location.
+
+        Returns:
+            requests.Response: The API response.
+        """
+        headers = {'If-None-Match': self._etag[1]} if self._etag[0] == path else {}
+
+        # Watch requests are held by the master until a change is committed
+        with self._stats.phase('watch' if path.startswith('/record/watch') else 'fetch'):
+            resp = self._session.get(f'{self._master_location}{path}', headers=headers, timeout=self._timeout)
+
+        self._stats.count('requests')
+        self._stats.count('bytes', resp.raw.tell() if resp.raw else len(resp.content))
+
+        # Remember the representation's version, which is the master's journal head
+        if resp.status_code in (200, 304) and resp.headers.get('ETag'):
+            version = resp.headers['ETag'].removeprefix('W/').strip('"')
+            self._master_seq = int(version) if version.isdigit() else self._master_seq
+
+            if resp.status_code == 200:
+                self._etag = (path, resp.headers['ETag'])
+
+        return resp
+
+    def _fullsync(self) -> bool:
+        """
+        Replaces the local record set with every record from the master and
+        positions the journal cursor at the master's journal head. Records are
+        fetched in pages, unless the page size is 0.
+
+        Returns:
+            bool: Whether the local record set was replaced.
+        """
+        records, seq, params = [], None, {'limit': self._page_size} if self._page_size else {}
+
+        while True:
+            resp = self._fetch(f'/record?{urllib.parse.urlencode(params)}' if params else '/record')
+
+            # Nothing changed since the previous full sync
+            if resp.status_code == 304:
+                logger.debug(f'No records updated.')
+                return False
+
+            # Keep current state on API error
+            if resp.status_code != 200:
+                logger.warning(f'API responded with {resp.status_code} HTTP status code.')
+                return False
+
+            with self._stats.phase('decode'):
+                body = resp.json()
+
+            records.extend(body.get('records', []))
+
+            # Changes committed while paging are replayed from the first page's journal head
+            seq = body.get('seq', 0) if seq is None else seq
+
+            if not body.get('next'):
+                break
+
+            params['after'] = body['next']
+
+        with self._stats.phase('index'):
+            self._index.replace(records)
+
+        self._seq, self._resynced = seq, True
+        self._stats.count('records', len(records))
+
+        logger.info(f'Fully synced {len(self._index)} records at journal sequence {self._seq}.')
+
+        return True
+
+    def _deltasync(self) -> bool:
+        """
+        Applies journal changes since the current cursor to the local record set.
+        Falls back to a full sync when the cursor is no longer in the journal.
+
+        Unless disabled, changes are watched so the master holds the request
+        until a change is committed or the watch timeout expires.
+
+        Returns:
+            bool: Whether any change was applied.
+        """
+        applied, more = 0, True
+
+        while more:
+            resp = self._fetch(
+                f'/record/watch?since={self._seq}&timeout={self._watch_timeout}' if self._watch_timeout
+                else f'/changes?since={self._seq}')
+
+            # Cursor was pruned from the journal
+            if resp.status_code == 410:
+                logger.warning(f'Journal cursor {self._seq} expired... Resyncing all records...')
+                return self._fullsync()
+
+            # Nothing changed since the previous identical request
+            if resp.status_code == 304:
+                break
+
+            # Keep current state on API error
+            if resp.status_code != 200:
+                logger.warning(f'API responded with {resp.status_code} HTTP status code.')
+                break
+
+            with self._stats.phase('decode'):
+                body = resp.json()
+
+            # Apply each change in journal order
+            with self._stats.phase('index'):
+                for change in body.get('changes', []):
+                    if change['action'] == 'delete':
+                        self._index.remove(change)
+                    else:
+                        self._index.upsert({k: change[k] for k in ('rname', 'rtype', 'rdata', 'ttl')})
+                    self._last_created = change.get('created')
+                    applied += 1
+
+            self._seq, more = body.get('seq', self._seq), body.get('more', False)
+
+        # Ignore when no records were updated
+        if not applied:
+            logger.debug(f'No records updated.')
+        else:
+            logger.info(f'Applied {applied} changes up to journal sequence {self._seq}.')
+
+        self._stats.count('changes', applied)
+
+        return applied > 0
+
+    def _flushzones(self) -> dict:
+        """
+        Rewrites the zone files of zones changed since the last flush and removes
+        files of zones which no longer hold any record. After a full sync, zone
+        files on disk which are unknown to the master are also removed.
+
+        Returns:
+            dict: The zones whose file was written or removed, mapped to their
+                touched records or None when the whole zone changed.
+        """
+        flushed, deleted, changes = [], [], {}
+        popped = self._index.popdirty()
+        dirty = sorted(popped.items())
+        records = {zone: self._index.records(zone) for zone, _ in dirty}
+
+        try:
+            # Flush the changed zones, across the flush threads when there are several
+            nonempty = [zone for zone, _ in dirty if records[zone]]
+            written = dict(zip(nonempty, (self._flusher.map if self._flusher and len(nonempty) > 1 else map)(
+                lambda zone: self._flushzone(zone, records[zone]), nonempty)))
+
+            # For each updated zone
+            for zone, touched in dirty:
+
+                # Keep flushed zones and remove emptied zones
+                if records[zone] and written[zone]:
+                    flushed.append(zone)
+                    changes[zone] = touched
+                elif not records[zone] and self._removezone(zone):
+                    deleted.append(zone)
+                    changes[zone] = touched
+
+            # Remove any unnecessary zone files
+            if self._resynced:
+                zones = set(self._index.zones())
+                for zone in [os.path.basename(f).rsplit('.', 1)[0]
+                             for f in glob.glob(f'{self._localdata_dir}/*.conf')]:
+                    if zone not in zones and self._removezone(zone):
+                        deleted.append(zone)
+                        changes[zone] = None
+
+            # Persist the renames and removals with a single directory sync
+            if changes and self._fsync:
+                fd = os.open(self._localdata_dir, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+        except OSError:
+
+            # Flush the zones again on the next cycle, rewriting those already written so they are applied
+            self._index.restore(popped)
+            self._hashes.update(dict.fromkeys(popped))
+
+            # Fully resync on the next cycle rather than following the journal from the failed full sync
+            if self._resynced:
+                self._seq, self._etag = None, (None, None)
+
+            raise
+
+        self._resynced = False
+
+        self._stats.count('zones_flushed', len(flushed))
+        self._stats.count('zones_deleted', len(deleted))
+
+        # Flushing zone info
+        if flushed:
+            logger.info(f'Flushed zones: {flushed}...')
+
+        if deleted:
+            logger.info(f'Deleted empty zone files: {deleted}')
+
+        return changes
+
     def rzone(self, record: dict) -> str:
         """
-        Returns the record's zone.
+        Returns the record's zone, as stored by the master when available.
+        """
+        return record.get('zone') or ZoneResolver.zone(record['rname'])
+
+    def _status(self) -> dict:
+        """
+        Returns the slave's state, recorded after each sync cycle.
         """
-        return tldextract.extract(record['rname']).registered_domain
+        return {
+            'seq': self._seq,
+            'master_seq': self._master_seq,
+            'lag': self._master_seq - self._seq if None not in (self._master_seq, self._seq) else None,
+            'delay': round(time.time() - self._last_created, 3) if self._last_created else None,
+            'records': len(self._index),
+            'zones': len(self._index.zones()),
+        }
 
     def stopthread(self):
         """
@@ -115,71 +496,65 @@ class ClusterSlave(threading.Thread):
         """
         This will run in a separate thread.
         """
-        while not self._stop:
+        # Serve the sync telemetry locally, syncing without it when its port is taken
+        status = None
+
+        if Config.get('cluster-slave.status-port'):
+            try:
+                status = self._stats.serve(Config.get('cluster-slave.status-bind', '127.0.0.1'),
+                                           Config.int('cluster-slave.status-port'))
+            except OSError as e:
+                logger.warning(f'Could not serve slave status: {str(e)}')
 
-            # Rest for a while
-            time.sleep(1)
+        while not self._stop:
 
-            # Check for update every x seconds
-            if time.time() - self._last_update < self._update_interval:
-                continue
+            # Update last updated time variable
+            self._last_update, changed = time.time(), False
+            self._last_created = None
+            self._stats.begin()
 
             # Query API for most recently updates
             try:
 
-                # Retrieve most recent
-                resp = requests.get(
-                    f'{self._master_location}/record?updated={self._last_update}', headers=self._slave_headers)
-
-                # Continue on API error
-                if resp.status_code != 200:
-                    logger.warning(f'API responded with {resp.status_code} HTTP status code.')
-                    continue
+                # Fully sync on startup, then follow the change journal
+                changed = self._fullsync() if self._seq is None else self._deltasync()
 
-                # Ignore when no records were updated
-                if not resp.json().get('records', []):
-                    logger.debug(f'No records updated.')
-                    continue
+                # If zone files changed update unbound, reloading it when changes cannot be applied. Changes
+                # which could not be flushed by a previous cycle are flushed again
+                with self._stats.phase('flush'):
+                    changes = self._flushzones() if changed or self._index.pending() else {}
 
-                # Retrieve all records
-                resp = requests.get(f'{self._master_location}/record', headers=self._slave_headers)
+                if changes:
+                    with self._stats.phase('apply'):
+                        applied = self._unboundapply(changes)
 
-                # Continue on API error
-                if resp.status_code != 200:
-                    logger.warning(f'API responded with {resp.status_code} HTTP status code.')
-                    continue
+                    if not applied:
+                        with self._stats.phase('reload'):
+                            self._stats.count('reloads', self._unboundreload())
 
-                records, zones = resp.json().get('records', []), []
+            except requests.RequestException as e:
+                logger.warning(f'Could not reach the master API: {str(e)}')
 
-                # For each updated zone
-                for zone, r in itertools.groupby(sorted(records, key=self.rzone), key=self.rzone):
-
-                    # Append zone to
-                    zones.append(zone)
+            except Exception:
+                logger.exception(f'Caught an unexpected exception')
 
-                    # Flush zone changes
-                    self._flushzone(zone, r)
+                # Wait for the update interval before retrying
+                changed = False
 
-                # Flushing zone info
-                logger.info(f'Flushed zones: {zones}...')
+            self._stats.end(**self._status())
 
-                # Remove any unnecessary zone files
-                if zones:
-                    zones_to_delete = [
-                        f for f in glob.glob(f'{self._localdata_dir}/*.conf')
-                        if os.path.basename(f).rsplit('.', 1)[0] not in zones
-                    ]
+            # Keep going while changes flow or after the master held a watch, otherwise
+            # check for update every x seconds
+            while not changed and not self._stop and time.time() - self._last_update < self._update_interval:
 
-                    # Delete empty zones
-                    map(os.unlink, zones_to_delete)
-                    logger.info(f'Deleted empty zone files: {zones_to_delete}')
+                # Rest for a while
+                time.sleep(1)
 
-                # If records were found reload unbound to update resolution
-                if records:
-                    self._unboundreload()
+        # Release the master connection, the flush threads and the status endpoint
+        self._session.close()
 
-                # Update last updated time variable
-                self._last_update = int(time.time())
+        if self._flusher:
+            self._flusher.shutdown()
 
-            except Exception:
-                logger.exception(f'Caught an unexpected exception')
+        if status:
+            status.shutdown()
@@ -0,0 +1,171 @@
+def rkey(record: dict) -> tuple:
+    """
+    Returns the record's identity, matching the master's primary key.
+
+    Args:
+        record (dict): The record.
+
+    Returns:
+        tuple: The (rname, rtype, rdata) record key.
+    """
+    return record['rname'], record['rtype'], record['rdata']
+
+
+class ZoneIndex(object):
+    """
+    In-memory index of the slave's record set grouped by zone, which keeps
+    track of the zones and records changed since they were last flushed.
+    """
+
+    def __init__(self, rzone):
+        """
+        Create an empty zone index.
+
+        Args:
+            rzone (callable): Resolves the zone of a record.
+        """
+        self._rzone = rzone
+        self._zones = {}
+        self._addresses = {}
+        self._dirty = {}
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed records.
+        """
+        return sum(len(records) for records in self._zones.values())
+
+    def replace(self, records: list):
+        """
+        Replaces the whole record set. Zones present before or after are marked as fully changed.
+
+        Args:
+            records (list): The new record set.
+        """
+        zones, self._addresses = {}, {}
+
+        for record in records:
+            zones.setdefault(self._rzone(record), {})[rkey(record)] = record
+            self._address(record)
+
+        self._dirty.update(dict.fromkeys(set(self._zones) | set(zones)))
+        self._zones = zones
+
+    def upsert(self, record: dict):
+        """
+        Inserts or replaces a record.
+
+        Args:
+            record (dict): The record.
+        """
+        zone = self._rzone(record)
+        previous = self._zones.setdefault(zone, {}).get(rkey(record))
+        self._zones[zone][rkey(record)] = record
+        self._address(record)
+        self._touch(zone, record, previous)
+
+    def remove(self, record: dict):
+        """
+        Removes a record, dropping its zone when left empty.
+
+        Args:
+            record (dict): The record, only its key fields are required.
+        """
+        zone = self._rzone(record)
+        records = self._zones.get(zone, {})
+        previous = records.pop(rkey(record), None)
+
+        if previous is None:
+            return
+
+        if not records:
+            del self._zones[zone]
+
+        self._address(previous, remove=True)
+        self._touch(zone, previous)
+
+    def _address(self, record: dict, remove: bool = False):
+        """
+        Indexes or unindexes an A record by its address.
+
+        Args:
+            record (dict): The record, ignored unless an A record.
+            remove (bool, optional): Whether to unindex the record. Defaults to False.
+        """
+        if record['rtype'] != 'A':
+            return
+
+        if not remove:
+            self._addresses.setdefault(record['rdata'], {})[rkey(record)] = record
+            return
+
+        records = self._addresses.get(record['rdata'], {})
+        records.pop(rkey(record), None)
+
+        if not records:
+            self._addresses.pop(record['rdata'], None)
+
+    def _touch(self, zone: str, *records: dict):
+        """
+        Marks records of a zone as changed, unless the whole zone already is.
+
+        Args:
+            zone (str): The zone.
+            records (dict): The changed records, None entries are ignored.
+        """
+        touched = self._dirty.setdefault(zone, [])
+
+        if touched is not None:
+            touched.extend(r for r in records if r is not None)
+
+    def zones(self) -> list:
+        """
+        Returns the indexed zones.
+        """
+        return list(self._zones)
+
+    def records(self, zone: str) -> list:
+        """
+        Returns a zone's records in a stable order, empty if the zone does not exist.
+
+        Args:
+            zone (str): The zone.
+        """
+        return sorted(self._zones.get(zone, {}).values(), key=rkey)
+
+    def addressed(self, address: str) -> list:
+        """
+        Returns the A records of an address across all zones, in a stable order.
+
+        Args:
+            address (str): The IPv4 address.
+        """
+        return sorted(self._addresses.get(address, {}).values(), key=rkey)
+
+    def popdirty(self) -> dict:
+        """
+        Returns and clears the changes since the last call, mapping each changed
+        zone to the list of its touched records (previous and current versions),
+        or to None when the whole zone was replaced.
+        """
+        dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    def restore(self, dirty: dict):
+        """
+        Marks changes returned by popdirty as pending again, such as when they could not be flushed.
+
+        Args:
+            dirty (dict): The changes, as returned by popdirty.
+        """
+        for zone, touched in dirty.items():
+            if touched is None or self._dirty.get(zone, []) is None:
+                self._dirty[zone] = None
+            else:
+                self._dirty[zone] = touched + self._dirty.get(zone, [])
+
+    def pending(self) -> bool:
+        """
+        Whether any change was not flushed yet.
+        """
+        return bool(self._dirty)
@@ -94,7 +94,7 @@ class Config(object):
         if not cls._configdict:
             cls.load(cls.CONFIG_FILE_PATH)
 
-        value = reduce(dict.get, key.split('.'), cls._configdict)
+        value = reduce(lambda d, k: d.get(k) if isinstance(d, dict) else None, key.split('.'), cls._configdict)
 
         return default if value is None else value
 
@@ -111,7 +111,22 @@ class Config(object):
         Returns:
             int: The configuration value.
         """
-        return int(cls.get(str, default))
+        return int(cls.get(key, default))
+
+    @classmethod
+    def float(cls, key: str, default: float = None):
+        """
+        Retrieves the value for a key from the configuration file.
+
+        Args:
+            key (str): The key from which to get the value. These
+                can be several splitted by a dot.
+            default (float): What to return if the key is not found.
+
+        Returns:
+            float: The configuration value.
+        """
+        return float(cls.get(key, default))
 
     @classmethod
     def getpath(cls, key):
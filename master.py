@@ -83,6 +83,10 @@ class UnboundClusterMaster(UnixProcess):
 
         logger.debug('Terminating...')
 
+        # Stop API workers
+        if self._apithread:
+            self._apithread.stopthread()
+
         # Stop syncer thread
         self._syncthread.stopthread()
 
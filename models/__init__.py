@@ -5,3 +5,6 @@ Base = declarative_base()
 
 # Local Imports
 from .record import Record
+from .change import Change
+from .migrate import migrate
+from .engine import tune, savepoints, writing
@@ -0,0 +1,134 @@
+# Third Party Imports
+from sqlalchemy import Column, Integer, String, Enum, Index, func, insert
+
+# Own Imports
+from . import Base
+from .record import unixtime
+from config import Config
+
+
+class Change(Base):
+
+    __tablename__ = 'changes'
+    __table_args__ = (
+        Index('ix_changes_zone_seq', 'zone', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    # Supported journal actions
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    seq = Column('seq', Integer, primary_key=True, autoincrement=True)
+    action = Column('action', Enum(UPSERT, DELETE), nullable=False)
+    rname = Column('rname', String(255), nullable=False)
+    rtype = Column('rtype', Enum(*Config.SUPPORTED_RECORD_TYPES), nullable=False)
+    rdata = Column('rdata', String(255), nullable=False)
+    ttl = Column('ttl', Integer, nullable=True)
+    zone = Column('zone', String(255), nullable=True)
+    created = Column('created', Integer, default=unixtime)
+
+    @classmethod
+    def upsert(cls, rname: str, rtype: str, rdata: str, ttl: int, zone: str) -> 'Change':
+        """
+        Creates a journal entry for an inserted or updated record.
+        """
+        return cls(action=cls.UPSERT, rname=rname, rtype=rtype, rdata=rdata, ttl=ttl, zone=zone)
+
+    @classmethod
+    def tombstone(cls, rname: str, rtype: str, rdata: str, zone: str) -> 'Change':
+        """
+        Creates a journal entry for a deleted record.
+        """
+        return cls(action=cls.DELETE, rname=rname, rtype=rtype, rdata=rdata, zone=zone)
+
+    @classmethod
+    def append(cls, dbconn, *changes: 'Change', prune: bool = True) -> int:
+        """
+        Appends changes to the journal within the ongoing transaction and prunes
+        entries which fell out of the retention window.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            changes (Change): The journal entries to append.
+            prune (bool, optional): Whether to prune the journal, left to the caller otherwise. Defaults to True.
+
+        Returns:
+            int: The sequence number of the last appended entry.
+        """
+        dbconn.add_all(changes)
+        dbconn.flush()
+
+        if prune:
+            cls.prune(dbconn, Config.int('cluster-master.journal-retention', 100000))
+
+        return changes[-1].seq
+
+    @classmethod
+    def extend(cls, dbconn, action: str, records: list) -> int:
+        """
+        Appends journal entries of the same action for many records with a single
+        statement within the ongoing transaction, pruning like append.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            action (str): The journal action.
+            records (list): The record dicts.
+
+        Returns:
+            int: The sequence number of the last appended entry.
+        """
+        dbconn.execute(insert(cls), [{
+            'action': action,
+            'rname': r['rname'],
+            'rtype': r['rtype'],
+            'rdata': r['rdata'],
+            'ttl': r.get('ttl'),
+            'zone': r.get('zone'),
+        } for r in records])
+        cls.prune(dbconn, Config.int('cluster-master.journal-retention', 100000))
+
+        return cls.head(dbconn)
+
+    @classmethod
+    def head(cls, dbconn) -> int:
+        """
+        Returns the most recent journal sequence number, 0 if the journal is empty.
+        """
+        return dbconn.query(func.max(cls.seq)).scalar() or 0
+
+    @classmethod
+    def tail(cls, dbconn) -> int:
+        """
+        Returns the oldest retained journal sequence number, 0 if the journal is empty.
+        """
+        return dbconn.query(func.min(cls.seq)).scalar() or 0
+
+    @classmethod
+    def prune(cls, dbconn, retention: int) -> int:
+        """
+        Removes journal entries older than the retention window.
+
+        Args:
+            dbconn (sqlalchemy.orm.Session): The database session.
+            retention (int): The number of most recent entries to keep.
+
+        Returns:
+            int: The number of pruned entries.
+        """
+        return dbconn.query(cls).filter(cls.seq <= cls.head(dbconn) - retention).delete(synchronize_session=False)
+
+    def todict(self) -> dict:
+        """
+        Dict-like representation of the model.
+        """
+        return {
+            'seq': self.seq,
+            'action': self.action,
+            'rname': self.rname,
+            'rtype': self.rtype,
+            'rdata': self.rdata,
+            'ttl': self.ttl,
+            'zone': self.zone,
+            'created': self.created,
+        }
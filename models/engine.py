@@ -0,0 +1,68 @@
+# Third Party Imports
+import sqlalchemy
+import sqlalchemy.orm
+
+
+def tune(engine: sqlalchemy.engine.Engine, pragmas: dict = None, readonly: bool = False):
+    """
+    Applies pragmas to each new connection of a SQLite engine, such as the journal mode,
+    synchronous level, cache and mmap sizes or busy timeout. Other engines are left as they are.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The datastore engine.
+        pragmas (dict, optional): The pragma values by name (e.g. {'journal_mode': 'wal'}).
+        readonly (bool, optional): Whether to restrict connections to reading. Defaults to False.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = {**(pragmas or {}), **({'query_only': 1} if readonly else {})}
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+        cursor.close()
+
+
+def savepoints(engine: sqlalchemy.engine.Engine):
+    """
+    Makes a SQLite engine begin its transactions itself rather than leaving it to the
+    pysqlite driver, which only does before data changes, so the rows a mutation reads
+    are part of its transaction and SAVEPOINTs are nested in the ongoing transaction
+    instead of committing on release. Transactions begun by writing() take the database
+    write lock right away (BEGIN IMMEDIATE). Other engines are left as they are.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The datastore engine.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @sqlalchemy.event.listens_for(engine, 'begin')
+    def begin(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if conn.get_execution_options().get('sqlite_immediate') else 'BEGIN')
+
+
+def writing(dbconn: sqlalchemy.orm.Session):
+    """
+    Begins the session's transaction for a mutation which reads the rows it then changes,
+    so no concurrent writer changes them in between: SQLite engines set up by savepoints()
+    take the write lock when beginning, and other databases lock the rows selected FOR UPDATE.
+    The session's ongoing transaction, such as one left open by reads after a previous
+    mutation, is committed first.
+
+    Args:
+        dbconn (sqlalchemy.orm.Session): The database session.
+    """
+    if dbconn.in_transaction():
+        dbconn.commit()
+
+    dbconn.connection(execution_options={'sqlite_immediate': True})
@@ -0,0 +1,43 @@
+# Third Party Imports
+import sqlalchemy
+from loguru import logger
+
+# Own Imports
+from .record import Record
+from .change import Change
+from utils.zone import ZoneResolver
+
+
+def migrate(engine: sqlalchemy.engine.Engine):
+    """
+    Upgrades tables created by previous versions, which create_all leaves as they are.
+
+    Adds the records and changes zone columns, filled in from the record names, and any missing index.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The datastore engine.
+    """
+    for model in (Record, Change):
+        columns = {c['name'] for c in sqlalchemy.inspect(engine).get_columns(model.__tablename__)}
+
+        if 'zone' not in columns:
+            logger.info(f'Adding zone column to the {model.__tablename__} table...')
+
+            with engine.begin() as conn:
+                conn.execute(sqlalchemy.text(f'ALTER TABLE {model.__tablename__} ADD COLUMN zone VARCHAR(255)'))
+
+                # Keep the records update timestamps, which would be bumped on update
+                values = {'zone': sqlalchemy.bindparam('zone')}
+                if model is Record:
+                    values['updated'] = Record.updated
+
+                names = conn.execute(sqlalchemy.select(model.rname).distinct()).scalars().all()
+                if names:
+                    conn.execute(
+                        sqlalchemy.update(model.__table__).where(model.rname == sqlalchemy.bindparam('name'))
+                        .values(**values),
+                        [{'name': name, 'zone': ZoneResolver.zone(name)} for name in names])
+
+        # Create indexes added after the table
+        for index in model.__table__.indexes:
+            index.create(engine, checkfirst=True)
@@ -27,8 +27,9 @@ class Record(Base):
     rtype = Column('rtype', Enum(*Config.SUPPORTED_RECORD_TYPES), primary_key=True, nullable=False)
     rdata = Column('rdata', String(255), primary_key=True, nullable=False)
     ttl = Column('ttl', Integer, default=3600, nullable=False)
+    zone = Column('zone', String(255), nullable=False, index=True)
     created = Column('created', Integer, default=unixtime)
-    updated = Column('updated', Integer, default=unixtime, onupdate=unixtime)
+    updated = Column('updated', Integer, default=unixtime, onupdate=unixtime, index=True)
 
     def todict(self) -> dict:
         """
@@ -39,6 +40,7 @@ class Record(Base):
             'rtype': self.rtype,
             'rdata': self.rdata,
             'ttl': self.ttl,
+            'zone': self.zone,
             'created': self.created,
             'updated': self.updated,
         }
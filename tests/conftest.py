@@ -0,0 +1,73 @@
+"""
+Shared fixtures. Cluster masters are run with the benchmarks' helpers, in their own
+processes since the API components keep their state in static classes.
+"""
+# Batteries
+import json
+import multiprocessing
+import os
+import sys
+import time
+import types
+
+# Third-party Imports
+import pytest
+import requests
+
+# Local Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmarks.cluster import freeport, serve  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def master(tmp_path):
+    """
+    Starts a cluster master with the example configuration, updated with the given
+    cluster-master options (None disabling an option), on a temporary SQLite datastore.
+
+    Returns:
+        callable: Starts the master, returning its HTTP session, API location and datastore path.
+    """
+    pytest.importorskip('bjoern')
+    processes = []
+
+    def start(**options) -> types.SimpleNamespace:
+        with open(os.path.join(Config.BASE_DIR, 'config.example.json')) as f:
+            config = json.load(f)
+
+        port, datastore = freeport(), str(tmp_path / 'master.sqlite')
+        config.pop('cluster-slave', None)
+        config['cluster-master'].update({
+            'datastore': f'sqlite:///{datastore}', 'bind': '127.0.0.1', 'port': port, 'server': 'threaded',
+            'access-log': None, **options})
+
+        configfile = tmp_path / 'config.json'
+        configfile.write_text(json.dumps(config))
+
+        process = multiprocessing.Process(target=serve, args=(str(configfile),), daemon=True)
+        process.start()
+        processes.append(process)
+
+        session = requests.Session()
+        session.trust_env = False
+        location = f'http://127.0.0.1:{port}/api'
+
+        # Wait for the API to answer
+        deadline = time.time() + 30
+        while True:
+            try:
+                session.get(f'{location}/zone', timeout=1)
+                break
+            except requests.RequestException:
+                if time.time() > deadline or not process.is_alive():
+                    raise RuntimeError('Cluster master did not start')
+                time.sleep(0.1)
+
+        return types.SimpleNamespace(session=session, location=location, datastore=datastore)
+
+    yield start
+
+    for process in processes:
+        process.terminate()
+        process.join()
@@ -0,0 +1,72 @@
+# Batteries
+import random
+import sqlite3
+import threading
+
+# Third-party Imports
+import pytest
+import requests
+
+# Datastore setups: plain SQLite, WAL with a read pool, and the example's group commits
+SETUPS = {
+    'plain': {'sqlite-pragmas': None, 'read-pool-size': None, 'group-commit': None},
+    'read-pool': {'group-commit': None},
+    'group-commit': {},
+}
+
+
+def replay(api) -> set:
+    """
+    Replays the whole change journal, returning the resulting record keys.
+    """
+    keys, since, more = set(), 0, True
+
+    while more:
+        body = api.session.get(f'{api.location}/changes', params={'since': since}).json()
+
+        for change in body['changes']:
+            key = (change['rname'], change['rtype'], change['rdata'])
+            (keys.add if change['action'] == 'upsert' else keys.discard)(key)
+
+        since, more = body['seq'], body['more']
+
+    return keys
+
+
+@pytest.mark.parametrize('setup', SETUPS)
+def test_journal_replay_matches_table(master, setup):
+    """
+    Concurrent creates, updates and deletes of the same records are journaled as committed.
+    """
+    api = master(**SETUPS[setup])
+
+    def write(seed):
+        session, rand = requests.Session(), random.Random(seed)
+        session.trust_env = False
+
+        for _ in range(100):
+            rname, rdata = f'h{rand.randrange(6)}.example.com', f'10.0.0.{rand.randrange(4)}'
+            action = rand.randrange(3)
+
+            if action == 0:
+                resp = session.post(f'{api.location}/record/A', json={'rname': rname, 'rdata': rdata})
+            elif action == 1:
+                resp = session.put(f'{api.location}/record/A/{rname}', json={'rdata': rdata})
+            else:
+                resp = session.delete(f'{api.location}/record/A/{rname}')
+
+            assert resp.status_code in (200, 201, 204, 409), resp.text
+
+    writers = [threading.Thread(target=write, args=(seed,)) for seed in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    with sqlite3.connect(api.datastore) as dbconn:
+        table = set(dbconn.execute('SELECT rname, rtype, rdata FROM records'))
+
+    listing = api.session.get(f'{api.location}/record').json()['records']
+
+    assert replay(api) == table
+    assert {(r['rname'], r['rtype'], r['rdata']) for r in listing} == table
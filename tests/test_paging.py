@@ -0,0 +1,112 @@
+# Third-party Imports
+import pytest
+
+
+def walk(api, limit: int, path: str = '/record', **params) -> list:
+    """
+    Lists records page by page, following the 'next' cursors.
+    """
+    records, after = [], None
+
+    while True:
+        body = api.session.get(
+            f'{api.location}{path}', params={'limit': limit, **params, **({'after': after} if after else {})}).json()
+        records.extend(body['records'])
+
+        if not body['next']:
+            return records
+
+        assert body['next'] != after, 'Cursor did not advance'
+        after = body['next']
+
+
+@pytest.fixture(params=[True, False], ids=['snapshot', 'datastore'])
+def api(request, master):
+    """
+    A master serving listings from the record snapshot or the datastore, with 250 records.
+    """
+    api = master(snapshot=request.param)
+    records = [{'rname': f'h{i:03}.example.com', 'rtype': 'A', 'rdata': f'10.0.0.{i}'} for i in range(200)] + \
+              [{'rname': f'h{i:03}.example.com', 'rtype': 'AAAA', 'rdata': f'2001:db8::{i}'} for i in range(50)]
+
+    assert api.session.post(f'{api.location}/records/bulk', json=records).json()['created'] == 250
+
+    return api
+
+
+def key(record: dict) -> tuple:
+    return record['rname'], record['rtype'], record['rdata']
+
+
+def test_paging_round_trip(api):
+    """
+    Pages hold every record once, in key order, whatever the page size.
+    """
+    listing = {key(r) for r in api.session.get(f'{api.location}/record').json()['records']}
+
+    for limit in (1, 7, 40, 250, 1000):
+        keys = [key(r) for r in walk(api, limit)]
+
+        assert keys == sorted(set(keys))
+        assert set(keys) == listing
+
+
+def test_paging_filtered(api):
+    """
+    Filtered listings are paged like whole listings.
+    """
+    records = api.session.get(f'{api.location}/record/AAAA').json()['records']
+
+    assert [key(r) for r in walk(api, 9, '/record/AAAA')] == [key(r) for r in sorted(records, key=key)]
+
+
+def test_paging_cursor_stability(api):
+    """
+    Records written while paging only show up on the pages following the cursor.
+    """
+    first = api.session.get(f'{api.location}/record', params={'limit': 100}).json()
+
+    for rname in ('a.example.com', 'z.example.com'):
+        assert api.session.post(f'{api.location}/record/A', json={'rname': rname, 'rdata': '10.1.0.1'}).ok
+
+    rest = walk(api, 100, after=first['next'])
+    keys = [key(r) for r in first['records'] + rest]
+
+    assert keys == sorted(set(keys))
+    assert ('z.example.com', 'A', '10.1.0.1') in keys
+    assert ('a.example.com', 'A', '10.1.0.1') not in keys
+
+
+def test_paging_comma_names(api):
+    """
+    Cursors on record names holding commas resume after that record.
+    """
+    assert api.session.post(f'{api.location}/record/A', json={'rname': 'h,1.example.com', 'rdata': '10.1.0.3'}).ok
+
+    keys = [key(r) for r in walk(api, 1)]
+
+    assert keys == sorted(set(keys))
+    assert ('h,1.example.com', 'A', '10.1.0.3') in keys
+
+
+def test_paging_bad_cursor(api):
+    """
+    Cursors without a name, type and data are rejected.
+    """
+    resp = api.session.get(f'{api.location}/record', params={'limit': 10, 'after': 'h001.example.com'})
+
+    assert resp.status_code == 400
+
+
+def test_paging_not_modified(api):
+    """
+    Pages are tagged with the journal head and answer 304 until the next write.
+    """
+    resp = api.session.get(f'{api.location}/record', params={'limit': 40})
+    headers = {'If-None-Match': resp.headers['ETag']}
+
+    assert api.session.get(f'{api.location}/record', params={'limit': 40}, headers=headers).status_code == 304
+
+    api.session.post(f'{api.location}/record/A', json={'rname': 'new.example.com', 'rdata': '10.1.0.2'})
+
+    assert api.session.get(f'{api.location}/record', params={'limit': 40}, headers=headers).status_code == 200
@@ -1,12 +1,12 @@
 # Third-party Imports
 import validators
-import tldextract
 
 # Batteries
 import ipaddress
 
 # Local Imports
 from config import Config
+from .zone import ZoneResolver
 
 
 class InvalidDNSRecordType(Exception):
@@ -28,16 +28,20 @@ class RecordValidator:
     Static class which validates received DNS records.
     """
     @classmethod
-    def validate(cls, rname: str, rtype: str, rdata: str) -> None:
+    def validate(cls, rname: str, rtype: str, rdata: str) -> str:
         """
         Validates a DNS record parameters.
+
+        Returns:
+            str: The record's zone.
         """
         # Check record type
         if rtype not in Config.SUPPORTED_RECORD_TYPES:
             raise InvalidDNSRecordType(f'Unsupported DNS record type "{rtype}".')
 
         # Extract zone from record and raise if invalid
-        if not tldextract.extract(rname).registered_domain:
+        zone = ZoneResolver.zone(rname)
+        if not zone:
             raise InvalidDNSRecord(f'Invalid zone for domain name "{rname}"')
 
         # Validate RDATA by RTYPE
@@ -63,3 +67,18 @@ class RecordValidator:
 
         except ValueError:
             raise InvalidDNSRecord(f'Invalid DNS {rtype} record RDATA: \'{rdata}\'')
+
+        return zone
+
+    @classmethod
+    def validatettl(cls, ttl) -> int:
+        """
+        Validates a DNS record TTL, an integer from 0 to 2^31 - 1 (RFC 2181).
+
+        Returns:
+            int: The TTL.
+        """
+        if not isinstance(ttl, int) or isinstance(ttl, bool) or not 0 <= ttl < 2 ** 31:
+            raise InvalidDNSRecord(f'Invalid DNS record TTL: \'{ttl}\'')
+
+        return ttl
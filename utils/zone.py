@@ -0,0 +1,139 @@
+# Batteries
+import functools
+import importlib.resources
+import threading
+
+# Third-party Imports
+from loguru import logger
+
+# Local Imports
+from config import Config
+
+
+class ZoneResolver(object):
+    """
+    Static class which resolves the zone (registered domain) of domain names
+    against the public suffix list, without any network access.
+
+    The list bundled with tldextract is used unless the 'public-suffix-list'
+    setting points to another copy. It is loaded once into a trie of reversed
+    labels, and resolved names are kept in a bounded LRU cache.
+    """
+    # Marks the trie nodes which end a public suffix rule
+    TERMINAL = '$'
+
+    # Label separators accepted by IDNA
+    SEPARATORS = ('。', '．', '｡')
+
+    # Class parameters
+    _lock = threading.Lock()
+    _trie = None
+    _cached = None
+
+    @classmethod
+    def _rules(cls) -> str:
+        """
+        Returns the public suffix list contents.
+        """
+        path = Config.get('public-suffix-list')
+
+        if path:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+
+        return importlib.resources.files('tldextract').joinpath('.tld_set_snapshot').read_text(encoding='utf-8')
+
+    @classmethod
+    def _load(cls):
+        """
+        Builds the suffix trie from the ICANN section of the public suffix list.
+        """
+        trie = {}
+
+        for line in cls._rules().splitlines():
+            line = line.strip()
+
+            # Private domains are not public suffixes of the managed zones
+            if line.startswith('// ===BEGIN PRIVATE DOMAINS==='):
+                break
+
+            if not line or line.startswith('//'):
+                continue
+
+            *labels, last = reversed(line.split()[0].lower().split('.'))
+            node = trie
+
+            for label in labels:
+                node = node.setdefault(label, {})
+
+            # Exception rules are kept next to the wildcard they override
+            if last.startswith('!'):
+                node[last] = True
+            else:
+                node.setdefault(last, {})[cls.TERMINAL] = True
+
+        cls._trie = trie
+        cls._cached = functools.lru_cache(maxsize=Config.int('zone-cache-size', 65536))(cls._resolve)
+
+        logger.debug(f'Loaded public suffix trie of {len(trie)} top-level domains.')
+
+    @staticmethod
+    def _decode(label: str) -> str:
+        """
+        Returns the unicode form of a punycode label, as listed in the public suffix list.
+        """
+        if label.startswith('xn--'):
+            try:
+                return label.encode('ascii').decode('idna')
+            except UnicodeError:
+                pass
+
+        return label
+
+    @classmethod
+    def _resolve(cls, name: str) -> str:
+        """
+        Resolves a domain name's zone, uncached.
+        """
+        for separator in cls.SEPARATORS:
+            name = name.replace(separator, '.')
+
+        labels = name.strip('.').split('.')
+        node, suffix = cls._trie, 0
+
+        # Find the longest matching suffix rule
+        for depth, label in enumerate(cls._decode(label.lower()) for label in reversed(labels)):
+            if f'!{label}' in node:
+                suffix = depth
+                break
+
+            node = node.get(label, node.get('*'))
+            if not isinstance(node, dict):
+                break
+
+            if cls.TERMINAL in node:
+                suffix = depth + 1
+
+        # The zone is the suffix along with the label before it
+        if not suffix or suffix >= len(labels) or not labels[-suffix - 1]:
+            return ''
+
+        return '.'.join(labels[-suffix - 1:])
+
+    @classmethod
+    def zone(cls, name: str) -> str:
+        """
+        Resolves the zone of a domain name.
+
+        Args:
+            name (str): The domain name (e.g. 'www.example.co.uk').
+
+        Returns:
+            str: The zone (e.g. 'example.co.uk'), empty when the name has no known public suffix.
+        """
+        if cls._cached is None:
+            with cls._lock:
+                if cls._cached is None:
+                    cls._load()
+
+        return cls._cached(name)